@@ -0,0 +1,212 @@
+"""Offline rollups over the dashboard's analytics events.
+
+Reads the daily JSONL files written by the dashboard's JsonlSink
+(events-YYYY-MM-DD.jsonl) in chunks, remembering how far into each file it
+got, so every run only processes lines it hasn't seen yet. Writes compact
+Parquet summaries, which the dashboard's admin panel (?admin=1) shows via
+load_summaries:
+
+  sessions_per_day.parquet  sessions by the day they were first seen
+  funnel.parquet            session_start -> calculation_completed -> product_interest -> lead_captured
+  savings_hist.parquet      distribution of potential_savings from product_interest events
+  savings_stats.parquet     count / mean / min / max of potential_savings
+
+Usage:
+  python analytics_rollup.py --events analytics --out analytics/summary
+  python analytics_rollup.py --full   # forget previous progress and rebuild from scratch
+"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FUNNEL = ["session_start", "calculation_completed", "product_interest", "lead_captured"]
+SAVINGS_BINS = np.append(np.arange(0, 100_001, 2_500, dtype=float), np.inf)
+CHUNK_LINES = 50_000
+
+MANIFEST = "manifest.json"  # {file name: byte offset already processed}
+SESSIONS_STATE = "sessions_state.parquet"  # one row per session: first day seen + funnel stages reached
+SUMMARIES = ["sessions_per_day", "funnel", "savings_hist", "savings_stats"]
+SESSION_AGG = {"first_date": "min", **{stage: "max" for stage in FUNNEL}}
+
+
+# ===== READING =====
+def iter_event_chunks(path: str, offset: int = 0, chunk_lines: int = CHUNK_LINES):
+    """Yield (events DataFrame, byte offset after it) for complete lines after `offset`.
+
+    A trailing line without a newline is still being written, so it is left for
+    the next run. Lines that aren't valid JSON are skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        done = False
+        while not done:
+            records = []
+            for _ in range(chunk_lines):
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    done = True
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+            columns = ["timestamp", "action", "properties", "session_id"]
+            yield pd.DataFrame.from_records(records, columns=columns), offset
+
+
+# ===== ROLLUPS =====
+def empty_sessions() -> pd.DataFrame:
+    return pd.DataFrame({"first_date": pd.Series(dtype="string"), **{s: pd.Series(dtype=bool) for s in FUNNEL}},
+                        index=pd.Index([], name="session_id", dtype="string"))
+
+
+def aggregate_sessions(events: pd.DataFrame) -> pd.DataFrame:
+    """One chunk of events as per-session rows (first day seen, stages reached)"""
+    events = events[events["session_id"].notna()]
+    chunk = pd.DataFrame({
+        "session_id": events["session_id"].astype("string"),
+        "first_date": events["timestamp"].astype("string").str[:10],
+        **{stage: (events["action"] == stage) for stage in FUNNEL}
+    })
+    return chunk.groupby("session_id").agg(SESSION_AGG)
+
+
+def update_sessions(sessions: pd.DataFrame, updates: pd.DataFrame) -> pd.DataFrame:
+    """Fold aggregated session rows (aggregate_sessions, possibly several chunks' worth) into the table.
+
+    Only sessions that appear in `updates` are regrouped; the rest of the table is
+    carried over as it is.
+    """
+    old = updates.index.unique().intersection(sessions.index)
+    merged = (pd.concat([sessions.loc[old], updates]) if len(old) else updates).groupby(level=0).agg(SESSION_AGG)
+    return merged if sessions.empty else pd.concat([sessions.drop(old), merged])
+
+
+def update_savings(hist: np.ndarray, stats: dict, events: pd.DataFrame):
+    """Add product_interest potential_savings from a chunk to the histogram and running stats"""
+    props = events.loc[events["action"] == "product_interest", "properties"]
+    values = pd.to_numeric(props.map(lambda p: p.get("potential_savings") if isinstance(p, dict) else None),
+                           errors="coerce").dropna().to_numpy()
+    if len(values) == 0:
+        return hist, stats
+    hist = hist + np.histogram(values, SAVINGS_BINS)[0]
+    stats = {
+        "count": stats["count"] + len(values),
+        "sum": stats["sum"] + float(values.sum()),
+        "min": min(stats["min"], float(values.min())),
+        "max": max(stats["max"], float(values.max())),
+    }
+    return hist, stats
+
+
+def funnel_table(sessions: pd.DataFrame) -> pd.DataFrame:
+    """Sessions reaching each stage having passed every earlier one, with conversion rates"""
+    reached = sessions[FUNNEL].cumprod(axis=1).sum().astype(int).to_numpy()
+    prev = np.concatenate([[reached[0]], reached[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "stage": FUNNEL,
+            "sessions": reached,
+            "step_conversion": np.where(prev > 0, reached / prev, np.nan),
+            "overall_conversion": np.where(reached[0] > 0, reached / reached[0], np.nan),
+        })
+
+
+# ===== STATE & OUTPUT =====
+def _write_parquet(df: pd.DataFrame, path: str, index: bool = False):
+    # Write then rename so the dashboard never reads a half-written file
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=index)
+    os.replace(tmp, path)
+
+
+def load_state(out_dir: str):
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    sessions_path = os.path.join(out_dir, SESSIONS_STATE)
+    sessions = pd.read_parquet(sessions_path) if os.path.exists(sessions_path) else empty_sessions()
+
+    hist_path = os.path.join(out_dir, "savings_hist.parquet")
+    hist = pd.read_parquet(hist_path)["count"].to_numpy() if os.path.exists(hist_path) \
+        else np.zeros(len(SAVINGS_BINS) - 1, dtype=np.int64)
+    stats_path = os.path.join(out_dir, "savings_stats.parquet")
+    stats = {"count": 0, "sum": 0.0, "min": np.inf, "max": -np.inf}
+    if os.path.exists(stats_path):
+        row = pd.read_parquet(stats_path).iloc[0]
+        stats = {"count": int(row["count"]), "sum": float(row["sum"]), "min": float(row["min"]), "max": float(row["max"])}
+    return manifest, sessions, hist, stats
+
+
+def save_state(out_dir: str, manifest: dict, sessions: pd.DataFrame, hist: np.ndarray, stats: dict):
+    _write_parquet(sessions, os.path.join(out_dir, SESSIONS_STATE), index=True)
+    _write_parquet(sessions.groupby("first_date").size().rename("sessions").reset_index()
+                   .rename(columns={"first_date": "date"}), os.path.join(out_dir, "sessions_per_day.parquet"))
+    _write_parquet(funnel_table(sessions), os.path.join(out_dir, "funnel.parquet"))
+    _write_parquet(pd.DataFrame({"bin_left": SAVINGS_BINS[:-1], "bin_right": SAVINGS_BINS[1:], "count": hist}),
+                   os.path.join(out_dir, "savings_hist.parquet"))
+    mean = stats["sum"] / stats["count"] if stats["count"] else np.nan
+    _write_parquet(pd.DataFrame([dict(stats, mean=mean)]), os.path.join(out_dir, "savings_stats.parquet"))
+    # Manifest last: if anything above fails, the next run redoes this batch
+    tmp = os.path.join(out_dir, f"{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+
+
+def load_summaries(out_dir: str) -> dict:
+    """The rollup tables keyed by name (missing ones are skipped) - cheap enough to call per rerun"""
+    paths = {n: os.path.join(out_dir, f"{n}.parquet") for n in SUMMARIES}
+    return {n: pd.read_parquet(p) for n, p in paths.items() if os.path.exists(p)}
+
+
+def run(events_dir: str, out_dir: str, full: bool = False, chunk_lines: int = CHUNK_LINES) -> dict:
+    """Process new event lines under `events_dir` and refresh the summaries in `out_dir`"""
+    os.makedirs(out_dir, exist_ok=True)
+    if full:
+        for name in [MANIFEST, SESSIONS_STATE] + [f"{n}.parquet" for n in SUMMARIES]:
+            if os.path.exists(os.path.join(out_dir, name)):
+                os.remove(os.path.join(out_dir, name))
+    manifest, sessions, hist, stats = load_state(out_dir)
+
+    processed, updates = 0, []
+    for path in sorted(glob.glob(os.path.join(events_dir, "events-*.jsonl"))):
+        name = os.path.basename(path)
+        if os.path.getsize(path) <= manifest.get(name, 0):
+            continue
+        for events, offset in iter_event_chunks(path, manifest.get(name, 0), chunk_lines):
+            if len(events):
+                updates.append(aggregate_sessions(events))
+                hist, stats = update_savings(hist, stats, events)
+                processed += len(events)
+            manifest[name] = offset
+
+    # The session table is merged once per run, touching only sessions seen in the new events
+    if updates:
+        sessions = update_sessions(sessions, pd.concat(updates))
+    save_state(out_dir, manifest, sessions, hist, stats)
+    return {"events": processed, "sessions": len(sessions), "files": len(manifest)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll up dashboard analytics events into Parquet summaries")
+    parser.add_argument("--events", default="analytics", help="directory with events-*.jsonl files")
+    parser.add_argument("--out", default=os.path.join("analytics", "summary"), help="output directory")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES, help="events parsed per chunk")
+    parser.add_argument("--full", action="store_true", help="discard previous progress and rebuild")
+    args = parser.parse_args(argv)
+
+    summary = run(args.events, args.out, full=args.full, chunk_lines=args.chunk_lines)
+    print(f"processed {summary['events']:,} new events; {summary['sessions']:,} sessions "
+          f"across {summary['files']} files -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Headless benchmarks for the dashboard's calculation and chart code.
+
+Times the roi_engine package directly and imports performance_dashboard without a
+Streamlit server (bare mode) for the chart builders and a full rerun. Each
+benchmark is timed over repeated rounds by a small built-in timer (no
+pytest-benchmark dependency) and reported as min/median/mean/stddev in JSON.
+The cold_start group times fresh Python processes importing the engine and the
+app. With --compare, any benchmark whose median got slower than the baseline by
+more than --threshold fails the run (exit code 1).
+
+Usage:
+  python benchmark.py                                   # writes benchmark_results.json
+  python benchmark.py --output baseline.json
+  python benchmark.py --compare baseline.json --threshold 0.25
+  python benchmark.py -k sweep                          # only benchmarks whose name contains "sweep"
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("ANALYTICS_SINK", "memory")
+
+import numpy as np
+from streamlit import config, logger
+
+# Parse the config now so it can't reset the level later, then silence bare-mode warnings
+config.get_option("logger.level")
+config.set_option("logger.level", "error")
+logger.set_log_level("error")
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "performance_dashboard.py")
+sys.path.insert(0, os.path.dirname(APP))
+import roi_engine as engine  # noqa: E402
+import performance_dashboard as dash  # noqa: E402  (bare mode: no server, st.* calls are no-ops)
+
+MIN_TIME = 0.5  # seconds of timed rounds per benchmark
+MAX_ROUNDS = 1000
+THRESHOLD = 0.20  # allowed slowdown of the median before --compare fails
+
+BENCHMARKS = []
+
+
+def benchmark(group: str, name: str, min_time: float = MIN_TIME):
+    """Register `setup() -> (func, extra_info)`; func() is what gets timed"""
+    def register(setup):
+        BENCHMARKS.append({"group": group, "name": name, "setup": setup, "min_time": min_time})
+        return setup
+    return register
+
+
+def run_benchmark(func, min_time: float) -> dict:
+    # Calibrate iterations per round so one round takes at least ~1 ms
+    func()
+    t0 = time.perf_counter()
+    func()
+    once = time.perf_counter() - t0
+    iterations = max(1, int(0.001 / once)) if once > 0 else 1000
+
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < MAX_ROUNDS and (len(times) < 5 or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        times.append((time.perf_counter() - t0) / iterations)
+    return {
+        "min": min(times), "max": max(times), "mean": statistics.fmean(times),
+        "median": statistics.median(times), "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": len(times), "iterations": iterations, "ops": 1 / statistics.fmean(times),
+    }
+
+
+def random_cases(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    cases = []
+    for _ in range(n):
+        vals = dict(engine.DEFAULTS)
+        vals.update(price=f"{rng.uniform(40, 150):.0f}", cups=f"{rng.uniform(30, 400):.0f}",
+                    rent=f"{rng.uniform(10_000, 80_000):,.0f}", cogs_thb=f"{rng.uniform(15, 45):.1f}")
+        cases.append(vals)
+    return cases
+
+
+# ===== PARSING =====
+MONEY_STRINGS = [f"฿{i * 37 % 100_000:,}.{i % 100:02d}" for i in range(10_000)]
+
+
+@benchmark("parse_money", "parse_money_uncached_10k")
+def bench_parse_money_raw():
+    def run():
+        for s in MONEY_STRINGS:
+            engine.parsing._parse_money_raw(s, 0.0)
+    return run, {"strings": len(MONEY_STRINGS)}
+
+
+@benchmark("parse_money", "parse_money_cached_10k")
+def bench_parse_money_cached():
+    def run():
+        for s in MONEY_STRINGS[:4000]:  # fits the LRU, so every call after warm-up is a hit
+            engine.parse_money(s)
+    return run, {"strings": 4000}
+
+
+# ===== ENGINE =====
+@benchmark("calc", "calc_case")
+def bench_calc_case():
+    vals = dict(engine.DEFAULTS)
+    return lambda: engine.calc_case(vals), {}
+
+
+for _points in (20, 1_000, 100_000):
+    @benchmark("sweep", f"sensitivity_sweep_{_points}")
+    def bench_sweep(points=_points):
+        xs = np.linspace(50, 400, points)
+        vals = dict(engine.DEFAULTS)
+        return lambda: engine.sensitivity_sweep(vals, "cups", xs), {"points": points}
+
+
+for _n in (3, 100, 10_000):
+    @benchmark("batch", f"calc_many_{_n}")
+    def bench_calc_many(n=_n):
+        cases = random_cases(n)
+        return lambda: engine.calc_many(cases), {"cases": n}
+
+
+# ===== CHARTS =====
+def chart_args(name: str):
+    R = engine.calc_case(engine.DEFAULTS)
+    xs = np.linspace(50, 400, 20)
+    return {
+        "gauge": (R["cups_day"], R["bep_day"]),
+        "waterfall": (R["revenue"], R["var_total"], R["fixed"], R["op"], R["tax"], R["net"]),
+        "scenario": (xs, engine.sensitivity_sweep(engine.DEFAULTS, "cups", xs), R["cups_day"]),
+        "costs": (tuple(engine.parse_money(engine.DEFAULTS[f]) for f in ("rent", "staff", "utils", "mkt", "others")),),
+    }[name]
+
+
+for _chart in ("gauge", "waterfall", "scenario", "costs"):
+    @benchmark("figure_build", f"{_chart}_figure")
+    def bench_figure(chart=_chart):
+        builder, args = getattr(dash, f"{chart}_figure"), chart_args(chart)
+        return lambda: builder(*args), {"json_bytes": len(builder(*args).to_json())}
+
+    @benchmark("figure_json", f"{_chart}_to_json")
+    def bench_figure_json(chart=_chart):
+        fig = getattr(dash, f"{chart}_figure")(*chart_args(chart))
+        return fig.to_json, {"json_bytes": len(fig.to_json())}
+
+
+# ===== COLD START =====
+# Wall time of a fresh interpreter doing the import, so "python" is the floor the others sit on
+COLD_START = {
+    "python": "pass",
+    "roi_engine": "import roi_engine",
+    "dashboard": "import performance_dashboard",  # bare mode, like the import above
+}
+
+for _name, _code in COLD_START.items():
+    @benchmark("cold_start", f"cold_start_{_name}", min_time=2.0)
+    def bench_cold_start(code=_code):
+        cmd = [sys.executable, "-c", code]
+
+        def run():
+            subprocess.run(cmd, cwd=os.path.dirname(APP), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return run, {"code": code}
+
+
+# ===== FULL RERUN =====
+@benchmark("rerun", "apptest_full_rerun", min_time=3.0)
+def bench_rerun():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at.run, {}
+
+
+# ===== REPORT =====
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    """Benchmarks whose median regressed by more than `threshold` against the baseline file"""
+    with open(baseline_path) as f:
+        baseline = {b["name"]: b for b in json.load(f)["benchmarks"]}
+    regressions = []
+    for b in results:
+        base = baseline.get(b["name"])
+        if base is None:
+            continue
+        ratio = b["stats"]["median"] / base["stats"]["median"]
+        b["baseline_ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(b)
+    return regressions
+
+
+def fmt_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard engine, charts and a full rerun")
+    parser.add_argument("-k", dest="keyword", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed median slowdown vs the baseline, as a fraction (default 0.20)")
+    parser.add_argument("--min-time", type=float, help="override the seconds of timed rounds per benchmark")
+    args = parser.parse_args(argv)
+
+    results = []
+    for b in BENCHMARKS:
+        if args.keyword not in b["name"]:
+            continue
+        func, extra_info = b["setup"]()
+        stats = run_benchmark(func, args.min_time or b["min_time"])
+        results.append({"group": b["group"], "name": b["name"], "stats": stats, "extra_info": extra_info})
+        print(f"{b['group']:<13} {b['name']:<28} median {fmt_time(stats['median']):>10}  "
+              f"stddev {fmt_time(stats['stddev']):>10}  rounds {stats['rounds']}")
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    report = {
+        "datetime": datetime.now().isoformat(),
+        "machine_info": {"python": platform.python_version(), "machine": platform.machine(),
+                         "processor": platform.processor(), "cpus": os.cpu_count()},
+        "threshold": args.threshold if args.compare else None,
+        "baseline": args.compare,
+        "benchmarks": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results -> {args.output}")
+
+    for b in regressions:
+        print(f"REGRESSION {b['name']}: median {b['baseline_ratio']:.2f}x baseline (threshold {1 + args.threshold:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
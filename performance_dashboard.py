@@ -1,13 +1,31 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
 from math import ceil
+from typing import TYPE_CHECKING
+from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-import re, html, json
+import html, json
 from urllib.parse import urlencode
 import hashlib
+import threading
+import os, sys, queue, time, atexit, sqlite3, pickle, logging
+
+from roi_engine import (
+    DEFAULTS, FIELDS, FIELD_LABELS, parse_money, parse_count, get_industry_benchmark,
+    CASE_DTYPE, parse_record, case_key, ResultCache, MAX_SWEEP_POINTS, MAX_GRID, parse_sweep_range,
+    sensitivity_sweep, sensitivity_grid, tornado, GOAL_METRICS, goal_seek,
+    MC_FIELDS, MC_DISTS, MC_MAX_SAMPLES, dist_spec, mc_blocks, mc_block, mc_summary, monte_carlo,
+    project_cashflows, WorkerPool, MAX_RUNNING, BackgroundJob, JobQueue, encode_cases, decode_cases,
+    MAX_VALUE_CHARS,
+)
+
+# pandas and plotly are heavy (about a second of cold start together) and only needed
+# once a chart or table is actually rendered, so the functions that use them import them
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objects as go
 
 # ===== ENHANCED THEME & BRANDING =====
 PRIMARY, SECONDARY, SUCCESS, DANGER = "#FABC3F", "#E85C0D", "#C7253E", "#821131"
@@ -32,8 +50,119 @@ st.set_page_config(
     }
 )
 
+# ===== RERUN PROFILER =====
+# Hidden admin panel: ?admin=1 for one session, or DASHBOARD_PROFILE=1 for every session
+PROFILE_WINDOW = 200  # most recent runs kept per section for the rolling p50/p95
+
+
+class RerunProfiler:
+    """Section timings (ms) and per-run counters from every profiled rerun in this process.
+
+    The run in progress lives in a thread-local because each session's script runs on its
+    own thread; finished runs are folded into rolling windows shared by all sessions.
+    """
+
+    def __init__(self, window: int = PROFILE_WINDOW):
+        self.window = window
+        self.runs = 0
+        self._sections = {}
+        self._counters = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return getattr(self._local, "run", None) is not None
+
+    def start(self):
+        # A run cut short by st.rerun/st.stop never finished - its partial numbers are dropped
+        self._local.run = {"sections": {}, "counters": {}, "parses": parse_count()}
+
+    def record(self, name: str, since: float):
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["sections"][name] = run["sections"].get(name, 0.0) + (time.perf_counter() - since) * 1000
+
+    @contextmanager
+    def section(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, t0)
+
+    def count(self, name: str, n: int = 1):
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["counters"][name] = run["counters"].get(name, 0) + n
+
+    def finish(self):
+        run, self._local.run = getattr(self._local, "run", None), None
+        if run is None:
+            return
+        # roi_engine counts parse_money calls per thread; this run's share is the difference
+        run["counters"]["parse_money"] = parse_count() - run["parses"]
+        with self._lock:
+            self.runs += 1
+            for store, values in ((self._sections, run["sections"]), (self._counters, run["counters"])):
+                for name, v in values.items():
+                    store.setdefault(name, deque(maxlen=self.window)).append(v)
+
+    @contextmanager
+    def run(self, name: str):
+        """Profile a fragment's own rerun; inside a full run it is just another section"""
+        if not profiling_enabled() or self.active:
+            with self.section(name):
+                yield
+            return
+        self.start()
+        try:
+            with self.section(f"run:{name}"):
+                yield
+        except BaseException:
+            self._local.run = None  # st.rerun() or an error - not a complete run
+            raise
+        self.finish()
+
+    def summary(self) -> dict:
+        def stats(values):
+            a = np.asarray(values, dtype=float)
+            return {"n": len(a), "p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)),
+                    "mean": float(a.mean()), "last": float(a[-1])}
+
+        with self._lock:
+            return {
+                "window": self.window,
+                "runs": self.runs,
+                "sections_ms": {k: stats(v) for k, v in sorted(self._sections.items())},
+                "counters": {k: stats(v) for k, v in sorted(self._counters.items())},
+            }
+
+
+@st.cache_resource
+def get_profiler() -> RerunProfiler:
+    return RerunProfiler()
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("DASHBOARD_PROFILE") == "1" or st.query_params.get("admin") == "1"
+
+
+profiler = get_profiler()
+_run_start = time.perf_counter()
+if profiling_enabled():
+    profiler.start()
+
+
+def profiled_markdown(body, *args, **kwargs):
+    """st.markdown that also counts the bytes it sends; the page uses it for all its markdown"""
+    if profiler.active:
+        profiler.count("markdown_bytes", len(str(body).encode()))
+    return st.markdown(body, *args, **kwargs)
+
 # ===== ENHANCED CSS WITH BETTER UX =====
-st.markdown(f"""
+_t = time.perf_counter()
+profiled_markdown(f"""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=Kanit:wght@300;400;500;600;700&display=swap');
 
@@ -320,13 +449,205 @@ st.markdown(f"""
   .stDeployButton {{display:none;}}
 </style>
 """, unsafe_allow_html=True)
+profiler.record("css", _t)
 
 
 # ===== ANALYTICS & TRACKING =====
+SESSION_EVENT_BUFFER = 200  # recent events kept per session; older ones live only in the sink
+PIPELINE_QUEUE_SIZE = 10_000  # events waiting to be flushed; beyond this new events are dropped
+FLUSH_BATCH = 500
+FLUSH_INTERVAL = 2.0  # seconds
+# High-frequency actions collapse into one record per session per window (seconds)
+COALESCE_WINDOWS = {"calculation_completed": 30.0}
+
+
+class EventSink:
+    """Destination for flushed analytics batches - subclass to plug in a real collector"""
+
+    def write(self, events: list):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySink(EventSink):
+    """Keeps the most recent events in memory - a local stand-in for a collector"""
+
+    def __init__(self, maxlen: int = 10_000):
+        self.events = deque(maxlen=maxlen)
+
+    def write(self, events: list):
+        self.events.extend(events)
+
+
+class JsonlSink(EventSink):
+    """Appends events to one JSONL file per day: <directory>/events-YYYY-MM-DD.jsonl"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, events: list):
+        by_day = {}
+        for event in events:
+            by_day.setdefault(event["timestamp"][:10], []).append(event)
+        for day, batch in by_day.items():
+            with open(os.path.join(self.directory, f"events-{day}.jsonl"), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in batch))
+
+
+class SQLiteSink(EventSink):
+    """Inserts events into an `events` table of a local SQLite file"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS events "
+                           "(timestamp TEXT, action TEXT, session_id TEXT, properties TEXT)")
+
+    def write(self, events: list):
+        rows = [(e["timestamp"], e["action"], e["session_id"],
+                 json.dumps(e["properties"], ensure_ascii=False, default=str)) for e in events]
+        with self._conn:
+            self._conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self._conn.close()
+
+
+def make_sink(spec: str) -> EventSink:
+    """Build a sink from a spec: jsonl:<directory>, sqlite:<file> or memory"""
+    kind, _, target = spec.partition(":")
+    if kind == "jsonl":
+        return JsonlSink(target or "analytics")
+    if kind == "sqlite":
+        return SQLiteSink(target or "analytics.db")
+    if kind == "memory":
+        return MemorySink()
+    raise ValueError(f"Unknown analytics sink: {spec}")
+
+
+class EventPipeline:
+    """Bounded queue drained by a background thread that writes batches to a sink.
+
+    emit() never blocks a rerun: when the queue is full the event is dropped and
+    counted. The flusher writes up to FLUSH_BATCH events at a time, every
+    FLUSH_INTERVAL seconds. Actions listed in `coalesce` are held per session for
+    their window and written as a single record whose properties are the latest
+    event's plus `count` and `last_timestamp`.
+    """
+
+    def __init__(self, sink: EventSink, maxsize: int = PIPELINE_QUEUE_SIZE, batch: int = FLUSH_BATCH,
+                 interval: float = FLUSH_INTERVAL, coalesce: dict = None):
+        self.sink = sink
+        self.batch = batch
+        self.interval = interval
+        self.coalesce = COALESCE_WINDOWS if coalesce is None else coalesce
+        self.enqueued = self.flushed = self.dropped = self.errors = self.coalesced = 0
+        self._queue = queue.Queue(maxsize)
+        self._pending = {}  # (session_id, action) -> (window end, aggregate record)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="analytics-flush", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: dict):
+        window = self.coalesce.get(event["action"])
+        if window:
+            self._coalesce(event, window)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.enqueued += 1
+
+    def _coalesce(self, event: dict, window: float):
+        key = (event["session_id"], event["action"])
+        with self._lock:
+            if key in self._pending:
+                aggregate = self._pending[key][1]
+                count = aggregate["properties"]["count"] + 1
+                aggregate["properties"] = dict(event["properties"], count=count, last_timestamp=event["timestamp"])
+                self.coalesced += 1
+            else:
+                aggregate = dict(event, properties=dict(event["properties"], count=1,
+                                                        last_timestamp=event["timestamp"]))
+                self._pending[key] = (time.monotonic() + window, aggregate)
+                self.enqueued += 1
+
+    def _expired(self, force: bool = False) -> list:
+        now = time.monotonic()
+        with self._lock:
+            keys = [k for k, (end, _) in self._pending.items() if force or end <= now]
+            return [self._pending.pop(k)[1] for k in keys]
+
+    def _write(self, batch: list):
+        try:
+            self.sink.write(batch)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self.dropped += len(batch)
+            return
+        with self._lock:
+            self.flushed += len(batch)
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            batch.extend(self._expired())
+            if batch:
+                self._write(batch)
+
+    def close(self):
+        # Best-effort drain of whatever is still queued (registered with atexit)
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        batch.extend(self._expired(force=True))
+        if batch:
+            self._write(batch)
+        self.sink.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"queued": self._queue.qsize(), "pending": len(self._pending), "enqueued": self.enqueued,
+                    "coalesced": self.coalesced, "flushed": self.flushed, "dropped": self.dropped,
+                    "errors": self.errors}
+
+
+# Where analytics_rollup.py writes its summaries for the jsonl sink's events
+ANALYTICS_SUMMARY_DIR = os.environ.get("ANALYTICS_SUMMARY_DIR", os.path.join("analytics", "summary"))
+
+
+@st.cache_resource
+def get_event_pipeline() -> EventPipeline:
+    # One pipeline per server process; ANALYTICS_SINK picks the sink (see make_sink)
+    pipeline = EventPipeline(make_sink(os.environ.get("ANALYTICS_SINK", "jsonl:analytics")))
+    atexit.register(pipeline.close)
+    return pipeline
+
+
 def track_user_action(action, properties=None):
-    """Simple analytics tracking - in production, integrate with Google Analytics, Mixpanel, etc."""
+    """Record an analytics event.
+
+    The session keeps only its last SESSION_EVENT_BUFFER events; every event is
+    also handed to the process-wide pipeline, which flushes it to the sink.
+    """
     if "analytics" not in st.session_state:
-        st.session_state.analytics = []
+        st.session_state.analytics = deque(maxlen=SESSION_EVENT_BUFFER)
 
     event = {
         "timestamp": datetime.now().isoformat(),
@@ -335,6 +656,7 @@ def track_user_action(action, properties=None):
         "session_id": st.session_state.get("session_id", "unknown")
     }
     st.session_state.analytics.append(event)
+    get_event_pipeline().emit(event)
 
 
 # ===== SESSION MANAGEMENT =====
@@ -346,11 +668,103 @@ if "user_progress" not in st.session_state:
     st.session_state.user_progress = 0
 
 
+# ===== SESSION MEMORY BUDGET =====
+SESSION_BUDGET_KB = int(os.environ.get("SESSION_BUDGET_KB", "256"))
+# Session keys dropped, in this order, when a session is over budget. Only state that isn't
+# rebuilt on every run belongs here - the event buffer duplicates what the sink already has.
+# Parsed records would be rebuilt by the very next run, trading CPU for no memory at all.
+EVICTABLE_STATE = ["analytics"]
+SESSION_REPORT_WINDOW = 1800  # seconds; sessions not seen for longer drop out of the report
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Approximate bytes held by obj and everything it references; shared objects count once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif isinstance(obj, (np.ndarray, np.generic)) and obj.base is not None:
+        size += deep_sizeof(obj.base, seen)  # views and records point into another buffer
+    return size
+
+
+class SessionRegistry:
+    """Latest size of every session in this process, as each session last measured itself.
+
+    Streamlit doesn't announce when a session goes away, so sessions that haven't
+    reported for SESSION_REPORT_WINDOW seconds are dropped from the report.
+    """
+
+    def __init__(self, budget: int, window: float = SESSION_REPORT_WINDOW):
+        self.budget = budget
+        self.window = window
+        self.evictions = 0
+        self._sessions = {}  # session_id -> (bytes, monotonic time last seen)
+        self._lock = threading.Lock()
+
+    def update(self, session_id: str, size: int, evicted: int = 0) -> bool:
+        """Record a session's size; True when it has just gone over budget"""
+        with self._lock:
+            was_over = self._sessions.get(session_id, (0, 0))[0] > self.budget
+            self._sessions[session_id] = (size, time.monotonic())
+            self.evictions += evicted
+            return size > self.budget and not was_over
+
+    def report(self) -> dict:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            self._sessions = {sid: v for sid, v in self._sessions.items() if v[1] >= cutoff}
+            sizes = [size for size, _ in self._sessions.values()]
+            return {"sessions": len(sizes), "bytes": sum(sizes), "max_bytes": max(sizes, default=0),
+                    "mean_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+                    "over_budget": sum(size > self.budget for size in sizes),
+                    "budget_bytes": self.budget, "evictions": self.evictions}
+
+
+@st.cache_resource
+def get_session_registry() -> SessionRegistry:
+    # One registry per server process, fed by every session
+    return SessionRegistry(SESSION_BUDGET_KB * 1024)
+
+
+def session_sizes() -> dict:
+    """Approximate bytes per session_state key (widget values included)"""
+    seen = set()
+    return {key: deep_sizeof(value, seen) for key, value in st.session_state.items()}
+
+
+def enforce_session_budget() -> dict:
+    """Measure this session, drop evictable state while it is over budget, and report the total.
+
+    A session still over budget after that is logged as a warning when it goes over.
+    """
+    registry = get_session_registry()
+    sizes = session_sizes()
+    total, evicted = sum(sizes.values()), 0
+    for key in EVICTABLE_STATE:
+        if total <= registry.budget:
+            break
+        if key in sizes:
+            del st.session_state[key]
+            total -= sizes.pop(key)
+            evicted += 1
+    if registry.update(st.session_state.session_id, total, evicted):
+        logging.getLogger("performance_dashboard").warning(
+            "Session %s holds %.0f KB, over the %.0f KB budget with nothing left to evict",
+            st.session_state.session_id, total / 1024, registry.budget / 1024)
+    return sizes
+
+
 # ===== LEAD CAPTURE MODAL =====
 def show_lead_capture_modal():
     if st.session_state.get("show_lead_modal", False):
         with st.container():
-            st.markdown("""
+            profiled_markdown("""
             <div style="position: fixed; top: 50%; left: 50%; transform: translate(-50%, -50%); 
                         background: white; padding: 2rem; border-radius: 20px; 
                         box-shadow: 0 20px 80px rgba(0,0,0,0.3); z-index: 1000; max-width: 400px; width: 90vw;">
@@ -371,7 +785,8 @@ def show_lead_capture_modal():
 
 
 # ===== ENHANCED HEADER WITH CTA =====
-st.markdown(f"""
+_t = time.perf_counter()
+profiled_markdown(f"""
 <div class="hero-header">
   <div class="hero-content">
     <div class="hero-text">
@@ -401,395 +816,221 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ===== SOCIAL PROOF =====
-st.markdown("""
+profiled_markdown("""
 <div class="social-proof">
   <div class="testimonial">"ใช้ตัวนี้คำนวณแล้วเปิดร้านได้กำไรจริง ตอนนี้มี 3 สาขาแล้ว!"</div>
   <div class="author">- คุณสมชาย, เจ้าของ Brew & Bean Coffee</div>
 </div>
 """, unsafe_allow_html=True)
-
-
-# ===== UTILITY FUNCTIONS =====
-def parse_money(s: str, default: float = 0.0) -> float:
-    if s is None: return default
-    s = str(s).strip()
-    if s == "": return default
-    neg = False
-    if s.startswith("(") and s.endswith(")"):
-        neg, s = True, s[1:-1]
-    s = s.replace("฿", "").replace(",", "").replace(" ", "")
-    if s.endswith("%"):
-        try:
-            v = float(s[:-1]) / 100.0
-            return -v if neg else v
-        except:
-            return default
-    try:
-        v = float(re.sub(r"[^0-9.\-]", "", s))
-        return -v if neg else v
-    except:
-        return default
-
-
-def pct_to_float(txt: str, default=0.0) -> float:
-    v = parse_money(txt, default)
-    return v if v <= 1 else v / 100.0
-
-
-def get_industry_benchmark(metric, value):
-    """Return industry benchmark comparison"""
-    benchmarks = {
-        "gross_margin": {"excellent": 0.65, "good": 0.55, "average": 0.45},
-        "payback_months": {"excellent": 12, "good": 18, "average": 24},
-        "daily_sales": {"excellent": 200, "good": 150, "average": 100}
-    }
-
-    if metric in benchmarks:
-        bench = benchmarks[metric]
-        if metric == "payback_months":
-            if value <= bench["excellent"]:
-                return "🏆 ดีเยี่ยม"
-            elif value <= bench["good"]:
-                return "✅ ดี"
-            elif value <= bench["average"]:
-                return "🔶 ปานกลาง"
-            else:
-                return "⚠️ ต้องปรับปรุง"
-        else:
-            if value >= bench["excellent"]:
-                return "🏆 ดีเยี่ยม"
-            elif value >= bench["good"]:
-                return "✅ ดี"
-            elif value >= bench["average"]:
-                return "🔶 ปานกลาง"
-            else:
-                return "⚠️ ต้องปรับปรุง"
-    return "📊 ไม่มีข้อมูลเปรียบเทียب"
+profiler.record("hero", _t)
 
 
 # ===== DEFAULT VALUES & SESSION STATE =====
-DEFAULTS = {
-    "price": "75", "cups": "180", "days": "26",
-    "cogs_thb": "28", "cogs_pct": "0", "pack": "2", "app_fee_pct": "0",
-    "rent": "35000", "staff": "70000", "utils": "12000", "mkt": "8000", "others": "5000",
-    "capex": "280000", "dep_years": "4", "tax_pct": "0"
-}
+DEFAULT_CASE_IDS = ["A", "B", "C"]
+MAX_CASES = 200
+MAX_TABS = 6  # above this only the active case gets an input form
+SHARE_PARAM = "s"  # query parameter holding an encode_cases token
+KPI_PAGE_SIZE = 6
 
-FIELDS = ["price", "cups", "days", "cogs_thb", "cogs_pct", "pack", "app_fee_pct",
-          "rent", "staff", "utils", "mkt", "others", "capex", "dep_years", "tax_pct"]
 
-CASE_IDS = ["A", "B", "C"]
+def next_case_id(existing) -> str:
+    """First free spreadsheet-style id: A..Z, AA, AB, ..."""
+    n = 0
+    while True:
+        n += 1
+        cid, k = "", n
+        while k:
+            k, r = divmod(k - 1, 26)
+            cid = chr(65 + r) + cid
+        if cid not in existing:
+            return cid
 
-# ===== SESSION INITIALIZATION =====
-if "cases" not in st.session_state:
-    st.session_state.cases = {cid: DEFAULTS.copy() for cid in CASE_IDS}
 
-if "active_case" not in st.session_state:
-    st.session_state.active_case = "A"
+def drop_case_widgets(cid):
+    # Widget state wins over `value=`, so clear it when a case's inputs are replaced
+    for field in FIELDS:
+        st.session_state.pop(f"{field}_{cid}", None)
 
-# ===== ENHANCED INPUT SECTION =====
-st.markdown('<div id="calculator"></div>', unsafe_allow_html=True)
-st.markdown("## 🧮 กรอกข้อมูลธุรกิจของคุณ")
-
-# Progress indicator
-progress = min(100, st.session_state.user_progress)
-st.markdown(f"""
-<div class="progress-bar">
-  <div class="progress-fill" style="width: {progress}%"></div>
-</div>
-<p style="text-align: center; color: {TEXT_SECONDARY}; font-size: 0.9rem;">
-  ความคืบหน้า: {progress}%
-</p>
-""", unsafe_allow_html=True)
-
-# Enhanced tabs with icons
-tab_icons = ["🏪", "🏬", "🏢"]
-tabs = st.tabs([f"{tab_icons[i]} Case {cid} {'(แนะนำ)' if cid == 'A' else ''}" for i, cid in enumerate(CASE_IDS)])
-
-# Quick actions
-col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
-with col1:
-    if st.button("📋 A → B", help="คัดลอกข้อมูล A ไป B"):
-        st.session_state.cases["B"] = st.session_state.cases["A"].copy()
-        track_user_action("copy_data", {"from": "A", "to": "B"})
-        st.rerun()
-with col2:
-    if st.button("📋 B → C", help="คัดลอกข้อมูล B ไป C"):
-        st.session_state.cases["C"] = st.session_state.cases["B"].copy()
-        track_user_action("copy_data", {"from": "B", "to": "C"})
-        st.rerun()
-with col3:
-    if st.button("🔄 รีเซ็ต", help="รีเซ็ตค่าเริ่มต้น"):
-        st.session_state.cases = {cid: DEFAULTS.copy() for cid in CASE_IDS}
-        track_user_action("reset_data")
-        st.rerun()
-with col4:
-    st.session_state.active_case = st.radio(
-        "เลือกเคสสำหรับดูรายละเอียด",
-        CASE_IDS,
-        horizontal=True,
-        index=CASE_IDS.index(st.session_state.active_case),
-        help="เลือกเคสที่ต้องการดูกราฟและการวิเคราะห์เชิงลึก"
-    )
-
-
-def enhanced_input_row(col1, col2, label, key_base, cid, default, help_text=""):
-    with col1:
-        value = st.text_input(
-            f"{label}",
-            value=st.session_state.cases[cid].get(key_base, default),
-            key=f"{key_base}_{cid}",
-            help=help_text,
-            placeholder=f"เช่น {default}"
-        )
-        st.session_state.cases[cid][key_base] = value
 
-        # Update progress
-        if value and value != "0":
-            st.session_state.user_progress = min(100, st.session_state.user_progress + 1)
+def add_case():
+    cid = next_case_id(st.session_state.cases)
+    st.session_state.cases[cid] = DEFAULTS.copy()
+    st.session_state.active_case = cid
+    track_user_action("add_case", {"case": cid})
 
 
-# Enhanced input sections for each case
-for i, cid in enumerate(CASE_IDS):
-    with tabs[i]:
-        with st.container():
-            st.markdown(f'<div class="input-group">', unsafe_allow_html=True)
-            st.markdown('<div class="section-title">💰 ข้อมูลการขาย</div>', unsafe_allow_html=True)
-
-            col1, col2, col3 = st.columns(3)
-            enhanced_input_row(col1, col2, "ราคา/แก้ว (บาท)", "price", cid, DEFAULTS["price"],
-                               "ราคาขายต่อแก้ว เช่น 75, 85, 120")
-            enhanced_input_row(col2, col3, "ยอดขาย (แก้ว/วัน)", "cups", cid, DEFAULTS["cups"],
-                               "จำนวนแก้วที่ขายได้ต่อวัน")
-            enhanced_input_row(col3, col1, "วันเปิด/เดือน", "days", cid, DEFAULTS["days"],
-                               "จำนวนวันที่เปิดทำการต่อเดือน")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            st.markdown(f'<div class="input-group">', unsafe_allow_html=True)
-            st.markdown('<div class="section-title">📦 ต้นทุนผันแปร (ต่อแก้ว)</div>', unsafe_allow_html=True)
-
-            col1, col2, col3, col4 = st.columns(4)
-            enhanced_input_row(col1, col2, "วัตถุดิบ/แก้ว (บาท)", "cogs_thb", cid, DEFAULTS["cogs_thb"],
-                               "ต้นทุนวัตถุดิบปัจจุบัน เช่น กาแฟ นม น้ำตาล (เปรียบเทียบกับวัตถุดิบพรีเมียมของเรา)")
-            enhanced_input_row(col2, col3, "% วัตถุดิบ", "cogs_pct", cid, DEFAULTS["cogs_pct"],
-                               "หรือใส่เป็น % จากราคาขาย - ดูการเปรียบเทียบต้นทุนด้านล่าง")
-            enhanced_input_row(col3, col4, "บรรจุภัณฑ์/แก้ว", "pack", cid, DEFAULTS["pack"],
-                               "ถ้วย ฝาปิด หลอด ถุงพลาสติก")
-            enhanced_input_row(col4, col1, "% ค่าแอป/เดลิเวอรี่", "app_fee_pct", cid, DEFAULTS["app_fee_pct"],
-                               "ค่าคอมมิชชั่น Grab Food, Food Panda")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            st.markdown(f'<div class="input-group">', unsafe_allow_html=True)
-            st.markdown('<div class="section-title">🏢 ต้นทุนคงที่ (ต่อเดือน)</div>', unsafe_allow_html=True)
-
-            col1, col2, col3 = st.columns(3)
-            enhanced_input_row(col1, col2, "ค่าเช่า", "rent", cid, DEFAULTS["rent"],
-                               "ค่าเช่าร้าน ค่าส่วนกลาง")
-            enhanced_input_row(col2, col3, "เงินเดือนพนักงาน", "staff", cid, DEFAULTS["staff"],
-                               "เงินเดือน + โบนัส + ประกันสังคม")
-            enhanced_input_row(col3, col1, "ค่าสาธารณูปโภค", "utils", cid, DEFAULTS["utils"],
-                               "ไฟ น้ำ โทรศัพท์ อินเทอร์เน็ต")
+def clone_case():
+    src = st.session_state.active_case
+    cid = next_case_id(st.session_state.cases)
+    st.session_state.cases[cid] = st.session_state.cases[src].copy()
+    st.session_state.active_case = cid
+    track_user_action("copy_data", {"from": src, "to": cid})
 
-            col1, col2 = st.columns(2)
-            enhanced_input_row(col1, col2, "งบการตลาด", "mkt", cid, DEFAULTS["mkt"],
-                               "โฆษณา Facebook, Google, ป้ายโฆษณา")
-            enhanced_input_row(col2, col1, "ค่าใช้จ่ายอื่น", "others", cid, DEFAULTS["others"],
-                               "ค่าทำความสะอาด ค่าซ่อมแซม ฯลฯ")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            st.markdown(f'<div class="input-group">', unsafe_allow_html=True)
-            st.markdown('<div class="section-title">💼 การลงทุนและภาษี</div>', unsafe_allow_html=True)
-
-            col1, col2, col3 = st.columns(3)
-            enhanced_input_row(col1, col2, "เงินลงทุนตั้งต้น", "capex", cid, DEFAULTS["capex"],
-                               "เครื่องชงกาแฟ ตู้แช่ เฟอร์นิเจอร์ ค่าตกแต่ง")
-            enhanced_input_row(col2, col3, "อายุการใช้งาน (ปี)", "dep_years", cid, DEFAULTS["dep_years"],
-                               "ระยะเวลาที่อุปกรณ์ใช้ได้")
-            enhanced_input_row(col3, col1, "% ภาษี", "tax_pct", cid, DEFAULTS["tax_pct"],
-                               "อัตราภาษีเงินได้นิติบุคคล (ถ้ามี)")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-
-# ===== CORE CALCULATION ENGINE =====
-def calc_case(vals: dict) -> dict:
-    price = parse_money(vals["price"])
-    cups_day = parse_money(vals["cups"])
-    days = max(1, int(parse_money(vals["days"], 26)))
-
-    cogs_thb = parse_money(vals["cogs_thb"])
-    cogs_pct = pct_to_float(vals["cogs_pct"])
-    pack = parse_money(vals["pack"])
-    app_fee = pct_to_float(vals["app_fee_pct"])
-
-    rent = parse_money(vals["rent"])
-    staff = parse_money(vals["staff"])
-    utils = parse_money(vals["utils"])
-    mkt = parse_money(vals["mkt"])
-    others = parse_money(vals["others"])
-
-    capex = parse_money(vals["capex"])
-    dep_years = max(1, int(parse_money(vals["dep_years"], 4)))
-    tax_pct = pct_to_float(vals["tax_pct"])
-
-    # Calculate variable costs
-    base_cogs = cogs_thb if str(vals["cogs_thb"]).strip() != "" else price * cogs_pct
-    var_cup = base_cogs + pack + (price * app_fee)
-    contrib = price - var_cup
-
-    # Monthly calculations
-    cups_month = cups_day * days
-    revenue = price * cups_month
-    var_total = var_cup * cups_month
-    gp = revenue - var_total
-    fixed = rent + staff + utils + mkt + others
-    op = gp - fixed
-    tax = max(0.0, op) * tax_pct
-    net = op - tax
-
-    # Additional metrics
-    depr = capex / (dep_years * 12)
-    if contrib <= 0:
-        bep_day = np.nan
-    else:
-        bep_day = fixed / contrib / days
-    payback = (capex / net) if net > 0 else np.inf
-
-    # Ratios and margins
-    gp_margin = gp / revenue if revenue > 0 else 0
-    net_margin = net / revenue if revenue > 0 else 0
-    roi_annual = (net * 12) / capex if capex > 0 else 0
-
-    return dict(
-        price=price, cups_day=cups_day, days=days, revenue=revenue, var_total=var_total,
-        gp=gp, fixed=fixed, op=op, tax=tax, net=net, contrib=contrib, bep_day=bep_day,
-        payback=payback, var_cup=var_cup, depr=depr, gp_margin=gp_margin,
-        net_margin=net_margin, roi_annual=roi_annual
-    )
 
+def delete_case():
+    cid = st.session_state.active_case
+    del st.session_state.cases[cid]
+    drop_case_widgets(cid)
+    track_user_action("delete_case", {"case": cid})
 
-# Calculate all cases
-results = {cid: calc_case(st.session_state.cases[cid]) for cid in CASE_IDS}
 
-# Track calculation completion
-track_user_action("calculation_completed", {
-    "cases": len([r for r in results.values() if r["revenue"] > 0])
-})
+def reset_cases():
+    for cid in st.session_state.cases:
+        drop_case_widgets(cid)
+    st.session_state.cases = {cid: DEFAULTS.copy() for cid in DEFAULT_CASE_IDS}
+    track_user_action("reset_data")
 
-# ===== ENHANCED KPI DASHBOARD =====
-st.markdown("---")
-
-# ===== COST COMPARISON SECTION (ใหม่) =====
-st.markdown("## 💰 เปรียบเทียบต้นทุนวัตถุดิบ")
-st.markdown(f"""
-<div style="background: linear-gradient(135deg, #fff8f0 0%, #fff0e6 100%); border-radius: 16px; padding: 1.5rem; margin-bottom: 2rem; border: 1px solid {PRIMARY};">
-  <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; text-align: center;">
-    <div>
-      <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">วัตถุดิบท้องตลาด</div>
-      <div style="font-size: 1.5rem; font-weight: 700; color: #dc2626;">฿35-45</div>
-      <div style="font-size: 0.8rem; color: {TEXT_SECONDARY};">ต่อแก้ว</div>
-    </div>
-    <div style="border-left: 1px solid #e5e5e5; border-right: 1px solid #e5e5e5;">
-      <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">CoffeePortals Premium</div>
-      <div style="font-size: 1.5rem; font-weight: 700; color: {SUCCESS};">฿22-28</div>
-      <div style="font-size: 0.8rem; color: {SUCCESS}; font-weight: 600;">ประหยัด 25-35%</div>
-    </div>
-    <div>
-      <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">กำไรเพิ่มขึ้น</div>
-      <div style="font-size: 1.5rem; font-weight: 700; color: {PRIMARY};">+฿15-20</div>
-      <div style="font-size: 0.8rem; color: {PRIMARY};">ต่อแก้ว</div>
-    </div>
-  </div>
-  <div style="text-align: center; margin-top: 1.5rem;">
-    <a href="{PURCHASE_URL}" target="_blank" style="background: {PRIMARY}; color: white; padding: 0.8rem 2rem; border-radius: 25px; text-decoration: none; font-weight: 700; display: inline-block;">
-      🛒 สั่งซื้อวัตถุดิบพรีเมียม
-    </a>
-  </div>
-</div>
-""", unsafe_allow_html=True)
 
-st.markdown("## 📊 สรุปผลการวิเคราะห์ (เปรียบเทียบ A/B/C)")
+# ===== SESSION INITIALIZATION =====
+if "cases" not in st.session_state:
+    st.session_state.cases = {cid: DEFAULTS.copy() for cid in DEFAULT_CASE_IDS}
+    # A shared link restores its cases before any input widget exists, so no rerun is needed
+    if SHARE_PARAM in st.query_params:
+        try:
+            st.session_state.cases, st.session_state.active_case = decode_cases(st.query_params[SHARE_PARAM], MAX_CASES)
+            track_user_action("shared_link_opened", {"cases": len(st.session_state.cases)})
+        except ValueError:
+            st.toast("⚠️ ลิงก์แชร์ไม่ถูกต้อง - ใช้ค่าเริ่มต้นแทน")
+
+if st.session_state.get("active_case") not in st.session_state.cases:
+    st.session_state.active_case = next(iter(st.session_state.cases))
+
+# ===== ENGINE CACHES =====
+# The calculations themselves live in roi_engine; the app only adds process-wide caching
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # One cache per server process so it survives reruns and is shared by sessions
+    return ResultCache()
+
+
+result_cache = get_result_cache()
+
+
+def parsed_cases(cases: dict) -> tuple:
+    """({cid: case_key}, {cid: parsed record}) for the session's cases.
+
+    The records live in session state as one CASE_DTYPE array (120 bytes a case)
+    next to the raw strings, which stay only for redisplay; the array is rebuilt,
+    re-parsing just the changed cases, only when some case's raw inputs change.
+    Every view reads numbers from the record instead of re-parsing the strings.
+    """
+    keys = {cid: case_key(vals) for cid, vals in cases.items()}
+    old_keys, old_records = st.session_state.get("parsed", ({}, None))
+    if keys != old_keys:
+        old_rows = dict(zip(old_keys.values(), old_records)) if old_records is not None else {}
+        rows = [old_rows[key] if key in old_rows else parse_record(cases[cid]) for cid, key in keys.items()]
+        st.session_state.parsed = (keys, np.array(rows, dtype=CASE_DTYPE))
+    records = st.session_state.parsed[1]
+    return keys, dict(zip(keys, records))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_tornado(key: str, _P: np.void, steps: tuple) -> "pd.DataFrame":
+    # Keyed on the case's case_key so the record doesn't need hashing on every rerun
+    return tornado(_P, steps)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_monte_carlo(key: str, _P: np.void, dists: dict, n: int, seed: int) -> dict:
+    return monte_carlo(_P, dists, n, seed)
+
+
+# Runs this big leave the script thread for the worker pool; in-process they would hold
+# the session for ~90 ms at 500k samples and ~165 ms at MC_MAX_SAMPLES (one core)
+POOL_MIN_SAMPLES = int(os.environ.get("POOL_MIN_SAMPLES", 500_000))
+# Background jobs running at once on this server; later ones wait for a free slot
+MAX_BACKGROUND_JOBS = int(os.environ.get("MAX_BACKGROUND_JOBS", MAX_RUNNING))
+JOB_POLL_SECONDS = 0.5
+
+
+@st.cache_resource
+def get_worker_pool() -> WorkerPool:
+    # One pool per server process, shared by every session; workers start on first use
+    pool = WorkerPool()
+    atexit.register(pool.shutdown)
+    return pool
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    # One queue per server process: identical inputs from any session share one job
+    jobs = JobQueue(max_running=MAX_BACKGROUND_JOBS)
+    atexit.register(jobs.shutdown)
+    return jobs
+
+
+def background_job(slot: str, job_id: str, fn, *args) -> BackgroundJob:
+    """Start - or re-attach to - the job for `job_id` as this session's `slot` job.
+
+    Only job ids live in session state; results stay with the queue. A slot's
+    previous job is released when its inputs change, which cancels it unless
+    another session is waiting for the same result.
+    """
+    ids = st.session_state.setdefault("jobs", {})
+    if ids.get(slot) not in (None, job_id):
+        release_job(slot)
+    ids[slot] = job_id
+    return get_job_queue().submit(job_id, fn, *args, owner=st.session_state.session_id)
+
+
+def release_job(slot: str):
+    job_id = st.session_state.get("jobs", {}).pop(slot, None)
+    if job_id is not None:
+        get_job_queue().release(job_id, st.session_state.session_id)
+
+
+def job_progress(job: BackgroundJob, label: str, render):
+    """Progress bar for a running job; once it has finished, render(job.result) or its error.
+
+    The bar polls in its own run_every fragment. Streamlit stops a fragment's timer only
+    on a full run, so the poll that sees the job finish asks for one, and that run draws
+    the finished job here directly, without a fragment.
+    """
+    if job.finished or not hasattr(st, "fragment"):
+        while not job.finished:
+            time.sleep(JOB_POLL_SECONDS)
+        if job.status == "done":
+            render(job.result)
+        elif job.status == "failed":
+            st.error(f"❌ ประมวลผลไม่สำเร็จ: {job.error}")
+        else:
+            st.info("งานถูกยกเลิก - ปรับค่าใดก็ได้เพื่อเริ่มใหม่")
+        return
 
-# Main KPIs
-kpi_cols = st.columns(4)
-kpi_metrics = [
-    ("revenue", "💰 รายได้/เดือน", "บาท"),
-    ("net", "💎 กำไรสุทธิ", "บาท"),
-    ("gp_margin", "📈 อัตรากำไรขั้นต้น", "%"),
-    ("payback", "⏰ Payback", "เดือน")
-]
+    def poll():
+        if job.finished:
+            st.rerun(scope="app")
+        text = f"{label} ({job.done}/{job.total})" if job.total else f"{label} (รอคิว)"
+        st.progress(job.progress, text=text)
 
-for i, (metric, title, unit) in enumerate(kpi_metrics):
-    with kpi_cols[i]:
-        st.markdown('<div class="kpi">', unsafe_allow_html=True)
-        st.markdown(f'<div class="label">{title}</div>', unsafe_allow_html=True)
-
-        for cid in CASE_IDS:
-            val = results[cid][metric]
-            if metric == "payback":
-                val_str = f"{val:.1f}" if val != np.inf else "∞"
-                benchmark = get_industry_benchmark("payback_months", val)
-            elif metric == "gp_margin":
-                val_str = f"{val * 100:.1f}%"
-                benchmark = get_industry_benchmark("gross_margin", val)
-            else:
-                val_str = f"฿{val:,.0f}"
-                benchmark = ""
+    st.fragment(poll, run_every=JOB_POLL_SECONDS)()
 
-            st.markdown(
-                f'<div class="val">{val_str} <span style="font-size:0.7rem;color:{TEXT_SECONDARY};">({cid})</span></div>',
-                unsafe_allow_html=True)
-            if benchmark:
-                st.markdown(f'<div style="font-size:0.7rem;margin-bottom:0.5rem;">{benchmark}</div>',
-                            unsafe_allow_html=True)
 
-        st.markdown('</div>', unsafe_allow_html=True)
+def monte_carlo_job(job: BackgroundJob, pool: WorkerPool, P: np.void, dists: dict, n: int, seed: int) -> dict:
+    # Runs on a job-queue thread: blocks are spread over the worker pool
+    tasks = [(P, dists, seed, start, size) for start, size in mc_blocks(n)]
+    blocks = job.follow(pool.map(mc_block, tasks))
+    return mc_summary(np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks]))
 
-# ===== DETAILED ANALYSIS FOR ACTIVE CASE =====
-active = st.session_state.active_case
-R = results[active]
-
-st.markdown("---")
-st.markdown(f"## 🎯 การวิเคราะห์เชิงลึก - Case {active}")
-
-# Enhanced metrics row
-met_cols = st.columns(3)
-with met_cols[0]:
-    bep_status = "✅ เกินจุดคุ้มทุน" if R["cups_day"] >= R["bep_day"] else "⚠️ ต่ำกว่าจุดคุ้มทุน"
-    st.metric(
-        "จุดคุ้มทุน vs ยอดจริง",
-        f"{ceil(R['bep_day']) if np.isfinite(R['bep_day']) else 'N/A'} แก้ว/วัน",
-        f"{R['cups_day'] - R['bep_day']:.0f} แก้ว" if np.isfinite(R['bep_day']) else "N/A",
-        help=bep_status
-    )
 
-with met_cols[1]:
-    roi_color = "normal" if R["roi_annual"] > 0.15 else "inverse"
-    st.metric(
-        "ROI ต่อปี",
-        f"{R['roi_annual'] * 100:.1f}%",
-        "ดีเยี่ยม" if R["roi_annual"] > 0.3 else ("ดี" if R["roi_annual"] > 0.15 else "ต้องปรับปรุง"),
-        delta_color=roi_color
-    )
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_projection(keys: tuple, _records: np.ndarray, months: int, ramp_months: int, ramp_start: float,
+                      seasonality: tuple, rent_growth: float, discount_rate: float) -> dict:
+    # Keyed on the cases' case_key hashes plus the projection settings
+    return project_cashflows(_records, months, ramp_months, ramp_start,
+                             seasonality, rent_growth, discount_rate)
 
-with met_cols[2]:
-    margin_color = "normal" if R["net_margin"] > 0.1 else "inverse"
-    st.metric(
-        "อัตรากำไรสุทธิ",
-        f"{R['net_margin'] * 100:.1f}%",
-        get_industry_benchmark("gross_margin", R["gp_margin"]),
-        delta_color=margin_color
-    )
 
-# Enhanced Visualizations
-viz_col1, viz_col2 = st.columns(2)
+# ===== CHART BUILDERS =====
+# Pure functions of case results, so their figures can be cached by argument hash
+def gauge_figure(cups_day: float, bep_day: float) -> "go.Figure":
+    import plotly.graph_objects as go
 
-with viz_col1:
-    # Interactive Break-even Gauge
-    val = R["cups_day"]
-    tgt = float(R["bep_day"]) if np.isfinite(R["bep_day"]) else 0
+    val = cups_day
+    tgt = float(bep_day) if np.isfinite(bep_day) else 0
     max_range = max(1.0, val * 1.5, tgt * 1.5)
 
-    fig_gauge = go.Figure(go.Indicator(
+    fig = go.Figure(go.Indicator(
         mode="gauge+number+delta",
         value=val,
         domain={'x': [0, 1], 'y': [0, 1]},
@@ -810,26 +1051,28 @@ with viz_col1:
         }
     ))
 
-    fig_gauge.update_layout(
+    fig.update_layout(
         height=350,
         margin=dict(l=20, r=20, t=40, b=20),
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_gauge, use_container_width=True)
+    return fig
+
+
+def waterfall_figure(revenue: float, var_total: float, fixed: float, op: float, tax: float, net: float) -> "go.Figure":
+    import plotly.graph_objects as go
 
-with viz_col2:
-    # Enhanced Waterfall Chart
     categories = ["รายได้", "ต้นทุนผันแปร", "ต้นทุนคงที่", "กำไรก่อนภาษี", "ภาษี", "กำไรสุทธิ"]
-    values = [R["revenue"], -R["var_total"], -R["fixed"], 0, -R["tax"], 0]
+    values = [revenue, -var_total, -fixed, 0, -tax, 0]
     measures = ["relative", "relative", "relative", "total", "relative", "total"]
 
-    fig_waterfall = go.Figure(go.Waterfall(
+    fig = go.Figure(go.Waterfall(
         name="20", orientation="v",
         measure=measures,
         x=categories,
         textposition="outside",
-        text=[f"฿{v:,.0f}" if v != 0 else f"฿{R['op']:,.0f}" if i == 3 else f"฿{R['net']:,.0f}" for i, v in
+        text=[f"฿{v:,.0f}" if v != 0 else f"฿{op:,.0f}" if i == 3 else f"฿{net:,.0f}" for i, v in
               enumerate(values)],
         y=values,
         connector={"line": {"color": TEXT_SECONDARY}},
@@ -838,190 +1081,914 @@ with viz_col2:
         totals={"marker": {"color": SECONDARY}}
     ))
 
-    fig_waterfall.update_layout(
+    fig.update_layout(
         title="โครงสร้างรายได้และกำไร",
         height=350,
         margin=dict(l=20, r=20, t=40, b=60),
         paper_bgcolor='rgba(0,0,0,0)',
         xaxis_tickangle=-45
     )
-    st.plotly_chart(fig_waterfall, use_container_width=True)
-
-# ===== SCENARIO ANALYSIS =====
-st.markdown("### 📈 การวิเคราะห์สถานการณ์แบบจำลอง")
-
-scenario_col1, scenario_col2 = st.columns(2)
+    return fig
 
-with scenario_col1:
-    st.markdown("**🎯 Sensitivity Analysis: ยอดขาย vs กำไร**")
 
-    range_input = st.text_input(
-        "ช่วงการทดสอบ (แก้ว/วัน)",
-        "50-400",
-        help="เช่น 50-400 หรือ 100,200,300"
-    )
-
-    # Parse range
-    if "-" in range_input:
-        try:
-            lo, hi = map(int, range_input.split("-"))
-            test_range = np.linspace(lo, hi, 20)
-        except:
-            test_range = np.linspace(50, 400, 20)
-    else:
-        try:
-            test_range = [int(x.strip()) for x in range_input.split(",")]
-        except:
-            test_range = np.linspace(50, 400, 20)
-
-    # Calculate scenarios
-    scenario_profits = []
-    for cups in test_range:
-        temp_case = st.session_state.cases[active].copy()
-        temp_case["cups"] = str(cups)
-        temp_result = calc_case(temp_case)
-        scenario_profits.append(temp_result["net"])
+def scenario_figure(test_range, scenario_profits, current_cups: float) -> "go.Figure":
+    import pandas as pd
+    import plotly.express as px
 
     scenario_df = pd.DataFrame({
         "cups_per_day": test_range,
         "net_profit": scenario_profits
     })
 
-    fig_scenario = px.line(
+    fig = px.line(
         scenario_df,
         x="cups_per_day",
         y="net_profit",
-        markers=True,
+        markers=len(test_range) <= 50,
+        render_mode="webgl" if len(test_range) > 1000 else "auto",
         title="กำไรสุทธิเมื่อยอดขายเปลี่ยน"
     )
 
-    fig_scenario.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="จุดคุ้มทุน")
-    fig_scenario.add_vline(x=R["cups_day"], line_dash="dot", line_color=SECONDARY, annotation_text="ปัจจุบัน")
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="จุดคุ้มทุน")
+    fig.add_vline(x=current_cups, line_dash="dot", line_color=SECONDARY, annotation_text="ปัจจุบัน")
 
-    fig_scenario.update_traces(line=dict(width=3, color=PRIMARY))
-    fig_scenario.update_layout(
+    fig.update_traces(line=dict(width=3, color=PRIMARY))
+    fig.update_layout(
         height=300,
         margin=dict(l=20, r=20, t=40, b=20),
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_scenario, use_container_width=True)
-
-with scenario_col2:
-    st.markdown("**🏪 เปรียบเทียบต้นทุนคงที่**")
-
-    # Cost breakdown pie chart
-    cost_categories = ["ค่าเช่า", "พนักงาน", "สาธารณูปโภค", "การตลาด", "อื่นๆ"]
-    cost_values = [
-        parse_money(st.session_state.cases[active]["rent"]),
-        parse_money(st.session_state.cases[active]["staff"]),
-        parse_money(st.session_state.cases[active]["utils"]),
-        parse_money(st.session_state.cases[active]["mkt"]),
-        parse_money(st.session_state.cases[active]["others"])
-    ]
+    return fig
+
 
-    fig_costs = px.pie(
-        values=cost_values,
-        names=cost_categories,
+def costs_figure(cost_values: tuple) -> "go.Figure":
+    import plotly.express as px
+
+    fig = px.pie(
+        values=list(cost_values),
+        names=["ค่าเช่า", "พนักงาน", "สาธารณูปโภค", "การตลาด", "อื่นๆ"],
         title="โครงสร้างต้นทุนคงที่",
         hole=0.4,
         color_discrete_sequence=[PRIMARY, SECONDARY, ACCENT_BLUE, SUCCESS, DANGER]
     )
 
-    fig_costs.update_traces(textposition='inside', textinfo='percent+label')
-    fig_costs.update_layout(
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(
         height=300,
         margin=dict(l=20, r=20, t=40, b=20),
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_costs, use_container_width=True)
+    return fig
 
-# ===== ENHANCED INSIGHTS & RECOMMENDATIONS =====
-st.markdown("---")
-st.markdown("## 🧠 AI Insights & คำแนะนำ")
 
-insights_col1, insights_col2 = st.columns(2)
+class FigureCache:
+    """Bounded LRU of built figures keyed by a hash of (builder, arguments), shared across sessions.
 
-with insights_col1:
-    st.markdown("### 📋 การวิเคราะห์ปัจจุบัน")
+    st.plotly_chart copies a figure before serializing it, so cached figures are
+    never mutated by rendering.
+    """
 
-    insights = []
-    warnings = []
-    recommendations = []
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Profitability Analysis
-    if R["net"] > 0:
-        insights.append(f"✅ **กำไรได้** ฿{R['net']:,.0f}/เดือน ({R['net_margin'] * 100:.1f}%)")
-    else:
-        warnings.append(f"⚠️ **ขาดทุน** ฿{abs(R['net']):,.0f}/เดือน")
-        recommendations.append("🎯 เพิ่มยอดขายหรือลดต้นทุน")
+    def get(self, builder, *args) -> "go.Figure":
+        key = hashlib.sha1(pickle.dumps((builder.__name__, args))).hexdigest()
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        with profiler.section(f"build:{builder.__name__}"):
+            fig = builder(*args)
+        with self._lock:
+            self._data[key] = fig
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return fig
 
-    # Break-even Analysis
-    if np.isfinite(R["bep_day"]):
-        if R["cups_day"] >= R["bep_day"]:
-            insights.append(f"✅ **เกินจุดคุ้มทุน** {R['cups_day'] - R['bep_day']:.0f} แก้ว/วัน")
-        else:
-            warnings.append(f"⚠️ **ต่ำกว่าจุดคุ้มทุน** {R['bep_day'] - R['cups_day']:.0f} แก้ว/วัน")
-            recommendations.append(f"🎯 เพิ่มยอดให้ถึง {ceil(R['bep_day'])} แก้ว/วัน")
-
-    # Margin Analysis
-    if R["gp_margin"] < 0.5:
-        warnings.append(f"⚠️ **กำไรขั้นต้นต่ำ** {R['gp_margin'] * 100:.1f}%")
-        recommendations.append("🎯 เปลี่ยนวัตถุดิบพรีเมียม → ลดต้นทุน 25%")
-    elif R["gp_margin"] > 0.65:
-        insights.append(f"✅ **กำไรขั้นต้นดี** {R['gp_margin'] * 100:.1f}%")
-
-    # Payback Analysis
-    if R["payback"] != np.inf:
-        if R["payback"] <= 18:
-            insights.append(f"✅ **คืนทุนเร็ว** {R['payback']:.1f} เดือน")
-        elif R["payback"] <= 36:
-            insights.append(f"🔶 **คืนทุนปานกลาง** {R['payback']:.1f} เดือน")
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
+
+
+figure_cache = get_figure_cache()
+
+
+def plotly_chart(fig: "go.Figure", name: str):
+    """st.plotly_chart, recording its time and JSON size while the run is profiled"""
+    with profiler.section(f"chart:{name}"):
+        st.plotly_chart(fig, use_container_width=True)
+    if profiler.active:
+        profiler.count("figure_bytes", len(fig.to_json()))
+
+# ===== PAGE FRAGMENTS =====
+# A widget inside a fragment reruns only that function, so editing a case skips the CSS,
+# header, product showcase and footer; nested fragments keep each analysis tool's
+# controls from rerunning the whole calculator.
+_st_fragment = getattr(st, "fragment", lambda func: func)
+
+
+def fragment(func):
+    """st.fragment whose own reruns are profiled as runs of their own"""
+    @wraps(func)
+    def run(*args, **kwargs):
+        with profiler.run(func.__name__):
+            return func(*args, **kwargs)
+    return _st_fragment(run)
+
+
+def profiled(func):
+    """Time every call of a page section under its function name"""
+    @wraps(func)
+    def timed(*args, **kwargs):
+        with profiler.section(func.__name__):
+            return func(*args, **kwargs)
+    return timed
+
+# Lazy mode: charts, scenario analysis and insights wait until the user switches them on.
+# Off by default; LAZY_SECTIONS=1 turns it on for every new session (e.g. on small containers).
+LAZY_SECTIONS = os.environ.get("LAZY_SECTIONS", "0") == "1"
+
+
+def show_section(label: str, key: str) -> bool:
+    """Whether a heavy section should render - always, unless lazy mode wants it switched on first"""
+    return not st.session_state.get("lazy_mode", LAZY_SECTIONS) or st.toggle(label, key=key)
+
+
+def enhanced_input_row(col1, col2, label, key_base, cid, default, help_text=""):
+    with col1:
+        value = st.text_input(
+            f"{label}",
+            value=st.session_state.cases[cid].get(key_base, default),
+            key=f"{key_base}_{cid}",
+            max_chars=MAX_VALUE_CHARS,  # longer values couldn't go into a share link
+            help=help_text,
+            placeholder=f"เช่น {default}"
+        )
+        st.session_state.cases[cid][key_base] = value
+
+        # Update progress
+        if value and value != "0":
+            st.session_state.user_progress = min(100, st.session_state.user_progress + 1)
+
+
+# ===== ENHANCED INPUT SECTION =====
+@profiled
+def input_section(case_ids: list):
+    """Progress, case actions, active-case picker and the input tabs"""
+    profiled_markdown('<div id="calculator"></div>', unsafe_allow_html=True)
+    profiled_markdown("## 🧮 กรอกข้อมูลธุรกิจของคุณ")
+
+    # Progress indicator
+    progress = min(100, st.session_state.user_progress)
+    profiled_markdown(f"""
+    <div class="progress-bar">
+      <div class="progress-fill" style="width: {progress}%"></div>
+    </div>
+    <p style="text-align: center; color: {TEXT_SECONDARY}; font-size: 0.9rem;">
+      ความคืบหน้า: {progress}%
+    </p>
+    """, unsafe_allow_html=True)
+
+    st.toggle("⚡ โหมดโหลดเร็ว", value=LAZY_SECTIONS, key="lazy_mode",
+              help="แสดงกราฟ การวิเคราะห์สถานการณ์ และคำแนะนำ เมื่อกดเปิดเท่านั้น เหมาะกับเครื่องหรือเน็ตที่ช้า")
+
+    # Quick actions run as callbacks, before the page is drawn, so no rerun cuts the page short
+    col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 3])
+    with col1:
+        st.button("➕ เพิ่มเคส", help="เพิ่มเคสใหม่ด้วยค่าเริ่มต้น", disabled=len(case_ids) >= MAX_CASES,
+                  on_click=add_case)
+    with col2:
+        st.button("📋 โคลนเคส", help="คัดลอกเคสที่เลือกเป็นเคสใหม่", disabled=len(case_ids) >= MAX_CASES,
+                  on_click=clone_case)
+    with col3:
+        st.button("🗑️ ลบเคส", help="ลบเคสที่เลือก", disabled=len(case_ids) <= 1, on_click=delete_case)
+    with col4:
+        st.button("🔄 รีเซ็ต", help="รีเซ็ตค่าเริ่มต้น", on_click=reset_cases)
+    with col5:
+        picker = st.radio if len(case_ids) <= MAX_TABS else st.selectbox
+        st.session_state.active_case = picker(
+            "เลือกเคสสำหรับดูรายละเอียด",
+            case_ids,
+            index=case_ids.index(st.session_state.active_case),
+            help="เลือกเคสที่ต้องการดูกราฟและการวิเคราะห์เชิงลึก",
+            **({"horizontal": True} if picker is st.radio else {})
+        )
+
+    # Enhanced tabs with icons - with many cases only the active one is editable
+    tab_icons = ["🏪", "🏬", "🏢"]
+    edit_ids = case_ids if len(case_ids) <= MAX_TABS else [st.session_state.active_case]
+    tabs = st.tabs([f"{tab_icons[case_ids.index(cid) % len(tab_icons)]} Case {cid} {'(แนะนำ)' if cid == 'A' else ''}"
+                    for cid in edit_ids])
+
+    # Enhanced input sections for each case
+    for i, cid in enumerate(edit_ids):
+        with tabs[i]:
+            with st.container():
+                profiled_markdown(f'<div class="input-group">', unsafe_allow_html=True)
+                profiled_markdown('<div class="section-title">💰 ข้อมูลการขาย</div>', unsafe_allow_html=True)
+
+                col1, col2, col3 = st.columns(3)
+                enhanced_input_row(col1, col2, "ราคา/แก้ว (บาท)", "price", cid, DEFAULTS["price"],
+                                   "ราคาขายต่อแก้ว เช่น 75, 85, 120")
+                enhanced_input_row(col2, col3, "ยอดขาย (แก้ว/วัน)", "cups", cid, DEFAULTS["cups"],
+                                   "จำนวนแก้วที่ขายได้ต่อวัน")
+                enhanced_input_row(col3, col1, "วันเปิด/เดือน", "days", cid, DEFAULTS["days"],
+                                   "จำนวนวันที่เปิดทำการต่อเดือน")
+                profiled_markdown('</div>', unsafe_allow_html=True)
+
+                profiled_markdown(f'<div class="input-group">', unsafe_allow_html=True)
+                profiled_markdown('<div class="section-title">📦 ต้นทุนผันแปร (ต่อแก้ว)</div>', unsafe_allow_html=True)
+
+                col1, col2, col3, col4 = st.columns(4)
+                enhanced_input_row(col1, col2, "วัตถุดิบ/แก้ว (บาท)", "cogs_thb", cid, DEFAULTS["cogs_thb"],
+                                   "ต้นทุนวัตถุดิบปัจจุบัน เช่น กาแฟ นม น้ำตาล (เปรียบเทียบกับวัตถุดิบพรีเมียมของเรา)")
+                enhanced_input_row(col2, col3, "% วัตถุดิบ", "cogs_pct", cid, DEFAULTS["cogs_pct"],
+                                   "หรือใส่เป็น % จากราคาขาย - ดูการเปรียบเทียบต้นทุนด้านล่าง")
+                enhanced_input_row(col3, col4, "บรรจุภัณฑ์/แก้ว", "pack", cid, DEFAULTS["pack"],
+                                   "ถ้วย ฝาปิด หลอด ถุงพลาสติก")
+                enhanced_input_row(col4, col1, "% ค่าแอป/เดลิเวอรี่", "app_fee_pct", cid, DEFAULTS["app_fee_pct"],
+                                   "ค่าคอมมิชชั่น Grab Food, Food Panda")
+                profiled_markdown('</div>', unsafe_allow_html=True)
+
+                profiled_markdown(f'<div class="input-group">', unsafe_allow_html=True)
+                profiled_markdown('<div class="section-title">🏢 ต้นทุนคงที่ (ต่อเดือน)</div>', unsafe_allow_html=True)
+
+                col1, col2, col3 = st.columns(3)
+                enhanced_input_row(col1, col2, "ค่าเช่า", "rent", cid, DEFAULTS["rent"],
+                                   "ค่าเช่าร้าน ค่าส่วนกลาง")
+                enhanced_input_row(col2, col3, "เงินเดือนพนักงาน", "staff", cid, DEFAULTS["staff"],
+                                   "เงินเดือน + โบนัส + ประกันสังคม")
+                enhanced_input_row(col3, col1, "ค่าสาธารณูปโภค", "utils", cid, DEFAULTS["utils"],
+                                   "ไฟ น้ำ โทรศัพท์ อินเทอร์เน็ต")
+
+                col1, col2 = st.columns(2)
+                enhanced_input_row(col1, col2, "งบการตลาด", "mkt", cid, DEFAULTS["mkt"],
+                                   "โฆษณา Facebook, Google, ป้ายโฆษณา")
+                enhanced_input_row(col2, col1, "ค่าใช้จ่ายอื่น", "others", cid, DEFAULTS["others"],
+                                   "ค่าทำความสะอาด ค่าซ่อมแซม ฯลฯ")
+                profiled_markdown('</div>', unsafe_allow_html=True)
+
+                profiled_markdown(f'<div class="input-group">', unsafe_allow_html=True)
+                profiled_markdown('<div class="section-title">💼 การลงทุนและภาษี</div>', unsafe_allow_html=True)
+
+                col1, col2, col3 = st.columns(3)
+                enhanced_input_row(col1, col2, "เงินลงทุนตั้งต้น", "capex", cid, DEFAULTS["capex"],
+                                   "เครื่องชงกาแฟ ตู้แช่ เฟอร์นิเจอร์ ค่าตกแต่ง")
+                enhanced_input_row(col2, col3, "อายุการใช้งาน (ปี)", "dep_years", cid, DEFAULTS["dep_years"],
+                                   "ระยะเวลาที่อุปกรณ์ใช้ได้")
+                enhanced_input_row(col3, col1, "% ภาษี", "tax_pct", cid, DEFAULTS["tax_pct"],
+                                   "อัตราภาษีเงินได้นิติบุคคล (ถ้ามี)")
+                profiled_markdown('</div>', unsafe_allow_html=True)
+
+    # After the tabs, so the link includes this run's edits
+    with st.popover("🔗 แชร์ชุดเคสนี้"):
+        try:
+            token = encode_cases(st.session_state.cases, st.session_state.active_case)
+        except ValueError:
+            st.warning(f"⚠️ ข้อมูล {len(case_ids)} เคสยาวเกินกว่าจะใส่ในลิงก์ได้ - ลองลดจำนวนเคสหรือความยาวข้อความ")
         else:
-            warnings.append(f"⚠️ **คืนทุนช้า** {R['payback']:.1f} เดือน")
-            recommendations.append("🎯 ลดเงินลงทุนเริ่มต้นหรือเพิ่มกำไร")
-
-    # Display insights
-    for insight in insights:
-        st.success(insight)
-
-    for warning in warnings:
-        st.warning(warning)
-
-with insights_col2:
-    st.markdown("### 🚀 คำแนะนำปรับปรุง")
-
-    for rec in recommendations:
-        st.info(rec)
-
-    # Additional strategic recommendations
-    if R["revenue"] > 0:
-        # Cost optimization with premium ingredients
-        current_cogs = parse_money(st.session_state.cases[active]["cogs_thb"])
-        if current_cogs > 25:
-            potential_savings = (current_cogs - 22) * R["cups_day"] * R["days"]
-            st.info(f"💰 **เปลี่ยนวัตถุดิบพรีเมียม** → ประหยัด ฿{potential_savings:,.0f}/เดือน")
-
-        # Revenue optimization
-        if R["contrib"] < 35:
-            st.info("🌟 **วัตถุดิบคุณภาพสูง** → เพิ่มราคาได้ 10-15% ลูกค้ายอมจ่าย")
-
-        # Product mix
-        if R["gp_margin"] < 0.6:
-            st.info("☕ **เมนูพิเศษจากวัตถุดิบพรีเมียม** → เพิ่มกำไรต่อแก้ว")
-
-    # CTA for premium ingredients
-    st.markdown(f"""
-    <div style="background: {PRIMARY}; color: white; padding: 1rem; border-radius: 12px; text-align: center; margin-top: 1rem;">
-        <div style="font-weight: 700; margin-bottom: 0.5rem;">🎯 ต้องการลดต้นทุนและเพิ่มคุณภาพ?</div>
-        <a href="{PURCHASE_URL}" target="_blank" style="color: white; background: rgba(255,255,255,0.2); padding: 0.5rem 1rem; border-radius: 20px; text-decoration: none; font-weight: 600;">
-            ดูวัตถุดิบพรีเมียม →
+            base_url = (getattr(st.context, "url", None) or "").split("?")[0]
+            st.code(f"{base_url}?{urlencode({SHARE_PARAM: token})}", language=None)
+            st.caption(f"ลิงก์นี้เก็บทุกเคส ({len(case_ids)} เคส) และเคสที่เลือกไว้ - เปิดแล้วได้ข้อมูลชุดเดียวกัน")
+
+
+# ===== ENHANCED KPI DASHBOARD =====
+@profiled
+def kpi_section(case_ids: list, results: dict):
+    """Cost comparison banner and the KPI grid for every case"""
+    profiled_markdown("---")
+
+    # ===== COST COMPARISON SECTION (ใหม่) =====
+    profiled_markdown("## 💰 เปรียบเทียบต้นทุนวัตถุดิบ")
+    profiled_markdown(f"""
+    <div style="background: linear-gradient(135deg, #fff8f0 0%, #fff0e6 100%); border-radius: 16px; padding: 1.5rem; margin-bottom: 2rem; border: 1px solid {PRIMARY};">
+      <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; text-align: center;">
+        <div>
+          <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">วัตถุดิบท้องตลาด</div>
+          <div style="font-size: 1.5rem; font-weight: 700; color: #dc2626;">฿35-45</div>
+          <div style="font-size: 0.8rem; color: {TEXT_SECONDARY};">ต่อแก้ว</div>
+        </div>
+        <div style="border-left: 1px solid #e5e5e5; border-right: 1px solid #e5e5e5;">
+          <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">CoffeePortals Premium</div>
+          <div style="font-size: 1.5rem; font-weight: 700; color: {SUCCESS};">฿22-28</div>
+          <div style="font-size: 0.8rem; color: {SUCCESS}; font-weight: 600;">ประหยัด 25-35%</div>
+        </div>
+        <div>
+          <div style="font-size: 0.9rem; color: {TEXT_SECONDARY}; margin-bottom: 0.5rem;">กำไรเพิ่มขึ้น</div>
+          <div style="font-size: 1.5rem; font-weight: 700; color: {PRIMARY};">+฿15-20</div>
+          <div style="font-size: 0.8rem; color: {PRIMARY};">ต่อแก้ว</div>
+        </div>
+      </div>
+      <div style="text-align: center; margin-top: 1.5rem;">
+        <a href="{PURCHASE_URL}" target="_blank" style="background: {PRIMARY}; color: white; padding: 0.8rem 2rem; border-radius: 25px; text-decoration: none; font-weight: 700; display: inline-block;">
+          🛒 สั่งซื้อวัตถุดิบพรีเมียม
         </a>
+      </div>
     </div>
     """, unsafe_allow_html=True)
 
+    profiled_markdown(f"## 📊 สรุปผลการวิเคราะห์ (เปรียบเทียบ {len(case_ids)} เคส)")
+
+    # Paginate the KPI cards so rendering cost stays flat as the number of cases grows
+    kpi_ids = case_ids
+    if len(case_ids) > KPI_PAGE_SIZE:
+        pages = ceil(len(case_ids) / KPI_PAGE_SIZE)
+        page = st.number_input(f"หน้า (ทั้งหมด {pages} หน้า)", min_value=1, max_value=pages, value=1)
+        kpi_ids = case_ids[(page - 1) * KPI_PAGE_SIZE:page * KPI_PAGE_SIZE]
+
+    # Main KPIs
+    kpi_cols = st.columns(4)
+    kpi_metrics = [
+        ("revenue", "💰 รายได้/เดือน", "บาท"),
+        ("net", "💎 กำไรสุทธิ", "บาท"),
+        ("gp_margin", "📈 อัตรากำไรขั้นต้น", "%"),
+        ("payback", "⏰ Payback", "เดือน")
+    ]
+
+    for i, (metric, title, unit) in enumerate(kpi_metrics):
+        with kpi_cols[i]:
+            profiled_markdown('<div class="kpi">', unsafe_allow_html=True)
+            profiled_markdown(f'<div class="label">{title}</div>', unsafe_allow_html=True)
+
+            for cid in kpi_ids:
+                val = results[cid][metric]
+                if metric == "payback":
+                    val_str = f"{val:.1f}" if val != np.inf else "∞"
+                    benchmark = get_industry_benchmark("payback_months", val)
+                elif metric == "gp_margin":
+                    val_str = f"{val * 100:.1f}%"
+                    benchmark = get_industry_benchmark("gross_margin", val)
+                else:
+                    val_str = f"฿{val:,.0f}"
+                    benchmark = ""
+
+                profiled_markdown(
+                    f'<div class="val">{val_str} <span style="font-size:0.7rem;color:{TEXT_SECONDARY};">({cid})</span></div>',
+                    unsafe_allow_html=True)
+                if benchmark:
+                    profiled_markdown(f'<div style="font-size:0.7rem;margin-bottom:0.5rem;">{benchmark}</div>',
+                                unsafe_allow_html=True)
+
+            profiled_markdown('</div>', unsafe_allow_html=True)
+
+    # Full comparison of every case - st.dataframe virtualizes its rows
+    if len(case_ids) > KPI_PAGE_SIZE:
+        with st.expander(f"📋 ตารางเปรียบเทียบทุกเคส ({len(case_ids)} เคส)"):
+            import pandas as pd
+
+            st.dataframe(
+                pd.DataFrame.from_dict(results, orient="index")[
+                    ["revenue", "net", "gp_margin", "net_margin", "bep_day", "payback", "roi_annual"]],
+                use_container_width=True
+            )
+
+
+# ===== DETAILED ANALYSIS FOR ACTIVE CASE =====
+@profiled
+def active_case_section(active: str, R: dict, P: np.void):
+    """Headline metrics, charts and scenario analysis for the active case"""
+    profiled_markdown("---")
+    profiled_markdown(f"## 🎯 การวิเคราะห์เชิงลึก - Case {active}")
+
+    # Enhanced metrics row
+    met_cols = st.columns(3)
+    with met_cols[0]:
+        bep_status = "✅ เกินจุดคุ้มทุน" if R["cups_day"] >= R["bep_day"] else "⚠️ ต่ำกว่าจุดคุ้มทุน"
+        st.metric(
+            "จุดคุ้มทุน vs ยอดจริง",
+            f"{ceil(R['bep_day']) if np.isfinite(R['bep_day']) else 'N/A'} แก้ว/วัน",
+            f"{R['cups_day'] - R['bep_day']:.0f} แก้ว" if np.isfinite(R['bep_day']) else "N/A",
+            help=bep_status
+        )
+
+    with met_cols[1]:
+        roi_color = "normal" if R["roi_annual"] > 0.15 else "inverse"
+        st.metric(
+            "ROI ต่อปี",
+            f"{R['roi_annual'] * 100:.1f}%",
+            "ดีเยี่ยม" if R["roi_annual"] > 0.3 else ("ดี" if R["roi_annual"] > 0.15 else "ต้องปรับปรุง"),
+            delta_color=roi_color
+        )
+
+    with met_cols[2]:
+        margin_color = "normal" if R["net_margin"] > 0.1 else "inverse"
+        st.metric(
+            "อัตรากำไรสุทธิ",
+            f"{R['net_margin'] * 100:.1f}%",
+            get_industry_benchmark("gross_margin", R["gp_margin"]),
+            delta_color=margin_color
+        )
+
+    # Enhanced Visualizations
+    if show_section("📊 แสดงกราฟจุดคุ้มทุนและโครงสร้างกำไร", "lazy_charts"):
+        viz_col1, viz_col2 = st.columns(2)
+
+        with viz_col1:
+            # Interactive Break-even Gauge
+            fig_gauge = figure_cache.get(gauge_figure, R["cups_day"], R["bep_day"])
+            plotly_chart(fig_gauge, "gauge")
+
+        with viz_col2:
+            # Enhanced Waterfall Chart
+            fig_waterfall = figure_cache.get(waterfall_figure, R["revenue"], R["var_total"], R["fixed"], R["op"],
+                                             R["tax"], R["net"])
+            plotly_chart(fig_waterfall, "waterfall")
+
+    # ===== SCENARIO ANALYSIS =====
+    profiled_markdown("### 📈 การวิเคราะห์สถานการณ์แบบจำลอง")
+
+    if not show_section("📈 แสดงการวิเคราะห์สถานการณ์", "lazy_scenario"):
+        return
+
+    scenario_col1, scenario_col2 = st.columns(2)
+
+    with scenario_col1:
+        profiled_markdown("**🎯 Sensitivity Analysis: ยอดขาย vs กำไร**")
+        scenario_sweep(P, R["cups_day"])
+
+    with scenario_col2:
+        profiled_markdown("**🏪 เปรียบเทียบต้นทุนคงที่**")
+
+        # Cost breakdown pie chart
+        cost_values = tuple(P[f].item() for f in ("rent", "staff", "utils", "mkt", "others"))
+
+        fig_costs = figure_cache.get(costs_figure, cost_values)
+        plotly_chart(fig_costs, "costs")
+
+
+@fragment
+def scenario_sweep(P: np.void, current_cups: float):
+    """Profit across a range of daily sales"""
+    range_col, points_col = st.columns([2, 1])
+    with range_col:
+        range_input = st.text_input(
+            "ช่วงการทดสอบ (แก้ว/วัน)",
+            "50-400",
+            help="เช่น 50-400 หรือ 100,200,300"
+        )
+    with points_col:
+        sweep_points = st.number_input(
+            "จำนวนจุด",
+            min_value=2,
+            max_value=MAX_SWEEP_POINTS,
+            value=20,
+            step=10,
+            help=f"ใช้กับช่วงแบบ ต่ำ-สูง (สูงสุด {MAX_SWEEP_POINTS:,} จุด)"
+        )
+
+    # The active case is already parsed; every point is evaluated in one batched call
+    test_range = parse_sweep_range(range_input, int(sweep_points))
+    scenario_profits = sensitivity_sweep(P, "cups", test_range)
+
+    fig_scenario = figure_cache.get(scenario_figure, test_range, scenario_profits, current_cups)
+    plotly_chart(fig_scenario, "scenario")
+
+
+# ===== 2D SENSITIVITY HEATMAP =====
+@fragment
+def heatmap_section(P: np.void, R: dict):
+    """Price × sales grid of any metric with the break-even contour"""
+    profiled_markdown("**🗺️ Heatmap: ราคา × ยอดขาย**")
+
+    if st.toggle("เปิดโหมดตาราง 2 มิติ", key="heatmap_on", help="ปรับราคาและยอดขายพร้อมกัน เพื่อหาจุดที่คุ้มทุน"):
+        import plotly.graph_objects as go
+
+        heat_metrics = {"net": "กำไรสุทธิ", "op": "กำไรก่อนภาษี", "gp": "กำไรขั้นต้น",
+                        "net_margin": "อัตรากำไรสุทธิ", "roi_annual": "ROI ต่อปี", "payback": "Payback (เดือน)"}
+        grid_col1, grid_col2, grid_col3, grid_col4 = st.columns(4)
+        with grid_col1:
+            price_range = st.text_input("ช่วงราคา (บาท/แก้ว)", "40-150", help="เช่น 40-150 หรือ 60,75,90")
+        with grid_col2:
+            cups_range = st.text_input("ช่วงยอดขาย (แก้ว/วัน)", "50-400", help="เช่น 50-400 หรือ 100,200,300")
+        with grid_col3:
+            grid_size = st.number_input("ความละเอียด (จุด/แกน)", min_value=2, max_value=MAX_GRID, value=60, step=10)
+        with grid_col4:
+            heat_metric = st.selectbox("ตัวชี้วัด", list(heat_metrics), format_func=heat_metrics.get)
+
+        grid_prices = parse_sweep_range(price_range, int(grid_size))[:MAX_GRID]
+        grid_cups = parse_sweep_range(cups_range, int(grid_size))[:MAX_GRID]
+        heat_z = sensitivity_grid(P, "price", grid_prices, "cups", grid_cups, heat_metric)
+        heat_net = heat_z if heat_metric == "net" else \
+            sensitivity_grid(P, "price", grid_prices, "cups", grid_cups)
+
+        fig_heat = go.Figure(go.Heatmap(
+            x=grid_prices, y=grid_cups,
+            z=np.where(np.isfinite(heat_z), heat_z, np.nan),  # inf payback renders as a gap
+            colorscale="RdYlGn_r" if heat_metric == "payback" else "RdYlGn",
+            colorbar=dict(title=heat_metrics[heat_metric])
+        ))
+        # Break-even line: where net profit crosses zero
+        fig_heat.add_trace(go.Contour(
+            x=grid_prices, y=grid_cups, z=heat_net,
+            contours=dict(start=0, end=0, size=1, coloring="lines"),
+            line=dict(color=TEXT_PRIMARY, width=3, dash="dash"),
+            showscale=False, hoverinfo="skip", name="จุดคุ้มทุน"
+        ))
+        fig_heat.add_trace(go.Scatter(
+            x=[R["price"]], y=[R["cups_day"]], mode="markers", name="ปัจจุบัน",
+            marker=dict(color=SECONDARY, size=12, symbol="x")
+        ))
+        fig_heat.update_layout(
+            height=450,
+            margin=dict(l=20, r=20, t=40, b=20),
+            paper_bgcolor='rgba(0,0,0,0)',
+            xaxis_title="ราคา/แก้ว (บาท)",
+            yaxis_title="ยอดขาย (แก้ว/วัน)",
+            showlegend=False
+        )
+        plotly_chart(fig_heat, "heatmap")
+
+
+# ===== TORNADO CHART =====
+@fragment
+def tornado_section(key: str, P: np.void, R: dict):
+    """One-at-a-time ±X% swings ranked by impact"""
+    profiled_markdown("**🌪️ Tornado: ตัวแปรไหนกระทบผลลัพธ์มากที่สุด**")
+
+    if st.toggle("เปิด Tornado chart", key="tornado_on", help="ปรับทีละตัวแปร ±X% แล้วดูว่าผลลัพธ์เปลี่ยนไปเท่าไร"):
+        import plotly.graph_objects as go
+
+        tor_col1, tor_col2 = st.columns(2)
+        with tor_col1:
+            tor_step = st.slider("ปรับค่า ± %", 1, 50, 10) / 100
+        with tor_col2:
+            tor_metric = st.radio("จัดอันดับตาม", ["net", "payback"], horizontal=True,
+                                  format_func={"net": "กำไรสุทธิ", "payback": "Payback"}.get)
+
+        tor_df = cached_tornado(key, P, (tor_step,))
+        tor_df = tor_df[tor_df[f"{tor_metric}_swing"] > 0].sort_values(f"{tor_metric}_swing")
+        tor_base = R[tor_metric]
+        tor_labels = tor_df["field"].map(FIELD_LABELS)
+
+        fig_tornado = go.Figure()
+        for side, name, color in [("low", f"-{tor_step:.0%}", DANGER), ("high", f"+{tor_step:.0%}", ACCENT_GREEN)]:
+            side_vals = tor_df[f"{tor_metric}_{side}"]
+            fig_tornado.add_trace(go.Bar(
+                y=tor_labels, x=side_vals.where(np.isfinite(side_vals)) - tor_base, base=tor_base, orientation="h",
+                name=name, marker_color=color
+            ))
+        fig_tornado.update_layout(
+            barmode="overlay",
+            height=max(300, 28 * len(tor_df) + 80),
+            margin=dict(l=20, r=20, t=40, b=20),
+            paper_bgcolor='rgba(0,0,0,0)',
+            title="กำไรสุทธิ (บาท/เดือน)" if tor_metric == "net" else "Payback (เดือน)"
+        )
+        if np.isfinite(tor_base):
+            fig_tornado.add_vline(x=tor_base, line_color=TEXT_SECONDARY)
+        plotly_chart(fig_tornado, "tornado")
+
+
+# ===== MONTE CARLO RISK MODE =====
+@fragment
+def monte_carlo_section(key: str, P: np.void):
+    """Distributions of net profit and payback under uncertain inputs"""
+    profiled_markdown("### 🎲 จำลองความเสี่ยง (Monte Carlo)")
+
+    if st.toggle("เปิดโหมดจำลองความเสี่ยง", key="mc_on", help="สุ่มค่าที่ไม่แน่นอนหลายแสนครั้ง เพื่อดูโอกาสขาดทุนและช่วงกำไรที่เป็นไปได้"):
+        dists = {}
+
+        dist_cols = st.columns(len(MC_FIELDS))
+        for col, field in zip(dist_cols, MC_FIELDS):
+            with col:
+                kind = st.selectbox(FIELD_LABELS[field], MC_DISTS, key=f"mc_dist_{field}")
+                spread = st.slider("± %", 0, 100, 20, key=f"mc_spread_{field}",
+                                   help="ความไม่แน่นอนรอบค่าปัจจุบัน (normal = ส่วนเบี่ยงเบนมาตรฐาน)")
+            if spread > 0 and np.isfinite(P[field]):
+                dists[field] = dist_spec(kind, P[field].item(), spread / 100)
+
+        opt_col1, opt_col2 = st.columns(2)
+        with opt_col1:
+            n_samples = st.select_slider("จำนวนรอบสุ่ม", [10_000, 100_000, 250_000, 500_000, MC_MAX_SAMPLES], value=100_000)
+        with opt_col2:
+            mc_seed = st.number_input("Seed", min_value=0, value=42, step=1, help="ใช้ seed เดิมจะได้ผลลัพธ์เดิมทุกครั้ง")
+
+        if n_samples >= POOL_MIN_SAMPLES:
+            # Big runs go to the job queue, keyed by their inputs: a rerun re-attaches to the same job
+            job_id = "monte_carlo:" + hashlib.sha1(json.dumps(
+                [key, dists, n_samples, int(mc_seed)], sort_keys=True).encode()).hexdigest()
+            job = background_job("monte_carlo", job_id, monte_carlo_job, get_worker_pool(),
+                                 P, dists, n_samples, int(mc_seed))
+            job_progress(job, "🎲 กำลังจำลอง...", monte_carlo_results)
+        else:
+            release_job("monte_carlo")
+            monte_carlo_results(cached_monte_carlo(key, P, dists, n_samples, int(mc_seed)))
+    else:
+        release_job("monte_carlo")
+
+
+def monte_carlo_results(mc: dict):
+    """Risk metrics and the net-profit histogram for a Monte Carlo summary"""
+    def fmt_payback(v):
+        return f"{v:.1f} เดือน" if np.isfinite(v) else "∞"
+
+    mc_cols = st.columns(4)
+    mc_cols[0].metric("โอกาสขาดทุน", f"{mc['p_loss'] * 100:.1f}%")
+    mc_cols[1].metric("กำไรสุทธิ P50", f"฿{mc['net_p50']:,.0f}")
+    mc_cols[2].metric("กำไรสุทธิ P5 – P95", f"฿{mc['net_p5']:,.0f} – ฿{mc['net_p95']:,.0f}")
+    mc_cols[3].metric("Payback P50", fmt_payback(mc["payback_p50"]),
+                      f"P5 {fmt_payback(mc['payback_p5'])} / P95 {fmt_payback(mc['payback_p95'])}",
+                      delta_color="off")
+
+    import plotly.graph_objects as go
+
+    # Histogram is binned server-side so the browser gets ~60 bars, not 100k points
+    edges = mc["hist_edges"]
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig_mc = go.Figure(go.Bar(
+        x=centers, y=mc["hist_counts"], width=np.diff(edges),
+        marker_color=[DANGER if c < 0 else ACCENT_GREEN for c in centers]
+    ))
+    fig_mc.add_vline(x=0, line_dash="dash", line_color="gray", annotation_text="จุดคุ้มทุน")
+    fig_mc.update_layout(
+        title=f"การกระจายกำไรสุทธิ ({mc['n']:,} รอบ)",
+        height=320,
+        margin=dict(l=20, r=20, t=40, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        bargap=0,
+        xaxis_title="กำไรสุทธิ/เดือน (บาท)",
+        yaxis_title="จำนวนรอบ"
+    )
+    plotly_chart(fig_mc, "monte_carlo")
+
+
+# ===== CASH-FLOW PROJECTION =====
+@fragment
+def projection_section(case_ids: list, active: str, keys: dict, records: dict):
+    """Month-by-month cash flow, payback, NPV and IRR for every case"""
+    profiled_markdown("### 📅 ประมาณการกระแสเงินสดรายเดือน")
+
+    if st.toggle("เปิดประมาณการกระแสเงินสด", key="projection_on", help="จำลองช่วงเริ่มต้นที่ยอดขายยังไม่เต็ม ฤดูกาล และค่าเช่าที่ขึ้นทุกปี"):
+        proj_col1, proj_col2, proj_col3 = st.columns(3)
+        with proj_col1:
+            proj_months = st.select_slider("ระยะเวลา (เดือน)", list(range(36, 121, 12)), value=60)
+            ramp_months = st.number_input("ช่วงเริ่มต้น (เดือน)", min_value=0, max_value=24, value=6,
+                                          help="จำนวนเดือนกว่ายอดขายจะถึงระดับปกติ")
+        with proj_col2:
+            ramp_start = st.slider("ยอดขายเดือนแรก (% ของปกติ)", 10, 100, 60) / 100
+            rent_growth = st.number_input("ค่าเช่าขึ้นต่อปี (%)", min_value=0.0, max_value=50.0, value=5.0) / 100
+        with proj_col3:
+            discount_rate = st.number_input("อัตราคิดลด NPV ต่อปี (%)", min_value=0.0, max_value=50.0, value=10.0) / 100
+            season_input = st.text_input("ฤดูกาล ม.ค.–ธ.ค. (ตัวคูณ)", "1,1,1,1,1,1,1,1,1,1,1,1",
+                                         help="12 ค่าคั่นด้วยจุลภาค เช่น 1.1 = ขายได้มากกว่าปกติ 10%")
+
+        seasonality = tuple(parse_money(x, 1.0) for x in season_input.split(","))
+        if len(seasonality) != 12:
+            st.warning("⚠️ ต้องใส่ตัวคูณฤดูกาล 12 ค่า - ใช้ 1 ทุกเดือนแทน")
+            seasonality = (1.0,) * 12
+
+        proj = cached_projection(tuple(keys.values()), np.array(list(records.values()), dtype=CASE_DTYPE), proj_months, int(ramp_months),
+                                 ramp_start, seasonality, rent_growth, discount_rate)
+
+        # Draw every case while it stays readable, otherwise just the active one
+        chart_ids = case_ids if len(case_ids) <= 10 else [active]
+        import pandas as pd
+        import plotly.graph_objects as go
+
+        fig_proj = go.Figure()
+        for cid in chart_ids:
+            idx = case_ids.index(cid)
+            fig_proj.add_trace(go.Scatter(
+                x=np.arange(proj_months + 1), y=proj["cumulative"][idx], mode="lines", name=f"Case {cid}",
+                line=dict(width=4 if cid == active else 2)
+            ))
+        fig_proj.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="คืนทุน")
+        fig_proj.update_layout(
+            title="เงินสดสะสม",
+            height=350,
+            margin=dict(l=20, r=20, t=40, b=20),
+            paper_bgcolor='rgba(0,0,0,0)',
+            xaxis_title="เดือน",
+            yaxis_title="บาท"
+        )
+        plotly_chart(fig_proj, "projection")
+
+        st.dataframe(
+            pd.DataFrame({
+                "คืนทุนเดือนที่": proj["payback_month"],
+                "NPV (บาท)": proj["npv"],
+                "IRR ต่อปี": proj["irr_annual"],
+            }, index=[f"Case {cid}" for cid in case_ids]).style.format(
+                {"คืนทุนเดือนที่": "{:.0f}", "NPV (บาท)": "฿{:,.0f}", "IRR ต่อปี": "{:.1%}"}, na_rep="-"),
+            use_container_width=True
+        )
+
+
+# ===== GOAL SEEK =====
+@fragment
+def goal_seek_section(active: str, P: np.void):
+    """Solve one input for a target net profit, payback or ROI"""
+    profiled_markdown("### 🎯 Goal Seek: ต้องปรับเท่าไรถึงจะถึงเป้า")
+
+    if st.toggle("เปิด Goal Seek", key="goal_seek_on", help="เลือกตัวแปรหนึ่งตัว แล้วให้ระบบหาค่าที่ทำให้ถึงเป้าหมาย"):
+        goal_col1, goal_col2, goal_col3 = st.columns(3)
+        with goal_col1:
+            goal_metric = st.selectbox("เป้าหมาย", list(GOAL_METRICS), format_func=GOAL_METRICS.get)
+        with goal_col2:
+            goal_target = st.number_input("ค่าเป้าหมาย", value={"net": 100000.0, "payback": 12.0, "roi_annual": 0.5}[goal_metric],
+                                          key=f"goal_target_{goal_metric}")
+        with goal_col3:
+            goal_field = st.selectbox("ปรับตัวแปร", FIELDS, format_func=FIELD_LABELS.get)
+
+        goal = goal_seek(P, goal_field, goal_metric, goal_target)
+        if goal["ok"]:
+            pct_field = goal_field in ("cogs_pct", "app_fee_pct", "tax_pct")
+            goal_str = f"{goal['value'] * 100:.2f}%" if pct_field else f"{goal['value']:,.2f}"
+            st.success(f"✅ ตั้ง **{FIELD_LABELS[goal_field]}** = **{goal_str}** "
+                       f"(ตอนนี้ {st.session_state.cases[active][goal_field] or '-'}) → "
+                       f"{GOAL_METRICS[goal_metric]} = {goal['achieved']:,.2f}")
+            if st.button(f"ใช้ค่านี้กับ Case {active}"):
+                st.session_state.cases[active][goal_field] = goal_str
+                drop_case_widgets(active)
+                track_user_action("goal_seek_applied", {"field": goal_field, "metric": goal_metric})
+                st.rerun()
+        else:
+            st.error(f"❌ {goal['message']}")
+
+
+# ===== ENHANCED INSIGHTS & RECOMMENDATIONS =====
+@profiled
+def insights_section(active: str, R: dict, P: np.void):
+    """Rule-based insights and recommendations for the active case"""
+    profiled_markdown("---")
+    profiled_markdown("## 🧠 AI Insights & คำแนะนำ")
+    if not show_section("🧠 แสดงคำแนะนำ", "lazy_insights"):
+        return
+
+    insights_col1, insights_col2 = st.columns(2)
+
+    with insights_col1:
+        profiled_markdown("### 📋 การวิเคราะห์ปัจจุบัน")
+
+        insights = []
+        warnings = []
+        recommendations = []
+
+        # Profitability Analysis
+        if R["net"] > 0:
+            insights.append(f"✅ **กำไรได้** ฿{R['net']:,.0f}/เดือน ({R['net_margin'] * 100:.1f}%)")
+        else:
+            warnings.append(f"⚠️ **ขาดทุน** ฿{abs(R['net']):,.0f}/เดือน")
+            recommendations.append("🎯 เพิ่มยอดขายหรือลดต้นทุน")
+
+        # Break-even Analysis
+        if np.isfinite(R["bep_day"]):
+            if R["cups_day"] >= R["bep_day"]:
+                insights.append(f"✅ **เกินจุดคุ้มทุน** {R['cups_day'] - R['bep_day']:.0f} แก้ว/วัน")
+            else:
+                warnings.append(f"⚠️ **ต่ำกว่าจุดคุ้มทุน** {R['bep_day'] - R['cups_day']:.0f} แก้ว/วัน")
+                recommendations.append(f"🎯 เพิ่มยอดให้ถึง {ceil(R['bep_day'])} แก้ว/วัน")
+
+        # Margin Analysis
+        if R["gp_margin"] < 0.5:
+            warnings.append(f"⚠️ **กำไรขั้นต้นต่ำ** {R['gp_margin'] * 100:.1f}%")
+            recommendations.append("🎯 เปลี่ยนวัตถุดิบพรีเมียม → ลดต้นทุน 25%")
+        elif R["gp_margin"] > 0.65:
+            insights.append(f"✅ **กำไรขั้นต้นดี** {R['gp_margin'] * 100:.1f}%")
+
+        # Payback Analysis
+        if R["payback"] != np.inf:
+            if R["payback"] <= 18:
+                insights.append(f"✅ **คืนทุนเร็ว** {R['payback']:.1f} เดือน")
+            elif R["payback"] <= 36:
+                insights.append(f"🔶 **คืนทุนปานกลาง** {R['payback']:.1f} เดือน")
+            else:
+                warnings.append(f"⚠️ **คืนทุนช้า** {R['payback']:.1f} เดือน")
+                recommendations.append("🎯 ลดเงินลงทุนเริ่มต้นหรือเพิ่มกำไร")
+
+        # Display insights
+        for insight in insights:
+            st.success(insight)
+
+        for warning in warnings:
+            st.warning(warning)
+
+    with insights_col2:
+        profiled_markdown("### 🚀 คำแนะนำปรับปรุง")
+
+        for rec in recommendations:
+            st.info(rec)
+
+        # Additional strategic recommendations
+        if R["revenue"] > 0:
+            # Cost optimization with premium ingredients
+            current_cogs = np.nan_to_num(P["cogs_thb"]).item()  # blank (NaN) = cost set as % of price
+            if current_cogs > 25:
+                potential_savings = (current_cogs - 22) * R["cups_day"] * R["days"]
+                st.info(f"💰 **เปลี่ยนวัตถุดิบพรีเมียม** → ประหยัด ฿{potential_savings:,.0f}/เดือน")
+
+            # Revenue optimization
+            if R["contrib"] < 35:
+                st.info("🌟 **วัตถุดิบคุณภาพสูง** → เพิ่มราคาได้ 10-15% ลูกค้ายอมจ่าย")
+
+            # Product mix
+            if R["gp_margin"] < 0.6:
+                st.info("☕ **เมนูพิเศษจากวัตถุดิบพรีเมียม** → เพิ่มกำไรต่อแก้ว")
+
+        # CTA for premium ingredients
+        profiled_markdown(f"""
+        <div style="background: {PRIMARY}; color: white; padding: 1rem; border-radius: 12px; text-align: center; margin-top: 1rem;">
+            <div style="font-weight: 700; margin-bottom: 0.5rem;">🎯 ต้องการลดต้นทุนและเพิ่มคุณภาพ?</div>
+            <a href="{PURCHASE_URL}" target="_blank" style="color: white; background: rgba(255,255,255,0.2); padding: 0.5rem 1rem; border-radius: 20px; text-decoration: none; font-weight: 600;">
+                ดูวัตถุดิบพรีเมียม →
+            </a>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+# ===== PRODUCT SALES FUNNEL =====
+@profiled
+def sales_funnel(active: str, R: dict, P: np.void):
+    """Savings offer for profitable cases that haven't viewed the products yet"""
+    if R["net"] > 0 and not st.session_state.get("product_viewed", False):
+        profiled_markdown("---")
+
+        # Calculate potential savings
+        current_cogs = np.nan_to_num(P["cogs_thb"]).item()
+        premium_cogs = 25  # Our premium ingredient cost
+        monthly_savings = max(0, (current_cogs - premium_cogs) * R["cups_day"] * R["days"])
+
+        if monthly_savings > 1000:  # Show offer if significant savings
+            profiled_markdown(f"""
+            <div style="background: linear-gradient(135deg, {SUCCESS} 0%, {PRIMARY} 100%); 
+                        color: white; border-radius: 20px; padding: 2rem; text-align: center; margin: 2rem 0;">
+                <h3 style="margin-bottom: 1rem;">🎉 คุณสามารถประหยัดได้!</h3>
+                <div style="font-size: 1.2rem; margin-bottom: 1rem;">
+                    <strong>฿{monthly_savings:,.0f}/เดือน</strong> ด้วยวัตถุดิบพรีเมียม
+                </div>
+                <div style="margin-bottom: 1.5rem; opacity: 0.9;">
+                    • คุณภาพสูงกว่า รสชาติดีกว่า<br>
+                    • ราคาโรงงาน ไม่ผ่านตัวกลาง<br>
+                    • ส่งตรงถึงร้าน บริการครบจบ
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("🛒 ดูสินค้าและราคา", type="primary", use_container_width=True):
+                    track_user_action("product_interest", {"potential_savings": monthly_savings})
+                    st.session_state.product_viewed = True
+                    # Redirect to purchase page
+                    profiled_markdown(f'<meta http-equiv="refresh" content="0;url={PURCHASE_URL}">', unsafe_allow_html=True)
+                    st.success("🔄 กำลังเปิดหน้าสั่งซื้อ...")
+
+        else:
+            st.info(f"💡 ดูวัตถุดิบพรีเมียมที่ [CoffeePortals.com]({PURCHASE_URL}) เพื่อเพิ่มคุณภาพและลดต้นทุน")
+
+
+@fragment
+def calculator():
+    """Inputs and every view that depends on them - editing a case reruns only this"""
+    case_ids = list(st.session_state.cases)
+    input_section(case_ids)
+
+    # Calculate all cases - unchanged cases are served from the result cache
+    with profiler.section("calc"):
+        keys, records = parsed_cases(st.session_state.cases)
+        results = result_cache.get_many(st.session_state.cases, keys, records)
+
+    # Track calculation completion - only when some case's inputs actually changed
+    calc_key = hashlib.sha1("|".join(keys.values()).encode()).hexdigest()
+    if st.session_state.get("last_calc_key") != calc_key:
+        st.session_state.last_calc_key = calc_key
+        track_user_action("calculation_completed", {
+            "cases": len([r for r in results.values() if r["revenue"] > 0])
+        })
+
+    active = st.session_state.active_case
+    R, P = results[active], records[active]
+    kpi_section(case_ids, results)
+    active_case_section(active, R, P)
+    heatmap_section(P, R)
+    tornado_section(keys[active], P, R)
+    monte_carlo_section(keys[active], P)
+    projection_section(case_ids, active, keys, records)
+    goal_seek_section(active, P)
+    insights_section(active, R, P)
+    sales_funnel(active, R, P)
+
+    # Last, so the session is measured after this run's changes
+    with profiler.section("session_budget"):
+        enforce_session_budget()
+
+
+calculator()
+
 # ===== PRODUCT SHOWCASE =====
-st.markdown("---")
-st.markdown("## 🌟 วัตถุดิบพรีเมียม - CoffeePortals")
+profiled_markdown("---")
+profiled_markdown("## 🌟 วัตถุดิบพรีเมียม - CoffeePortals")
 
 showcase_cols = st.columns(3)
 products = [
@@ -1047,7 +2014,7 @@ products = [
 
 for i, product in enumerate(products):
     with showcase_cols[i]:
-        st.markdown(f"""
+        profiled_markdown(f"""
         <div style="background: white; border: 1px solid #e5e5e5; border-radius: 12px; padding: 1rem; text-align: center; height: 200px; display: flex; flex-direction: column; justify-content: space-between;">
             <div>
                 <h4 style="color: {PRIMARY}; margin-bottom: 0.5rem;">{product['name']}</h4>
@@ -1058,7 +2025,7 @@ for i, product in enumerate(products):
         </div>
         """, unsafe_allow_html=True)
 
-st.markdown(f"""
+profiled_markdown(f"""
 <div style="text-align: center; margin: 2rem 0;">
     <a href="{PURCHASE_URL}" target="_blank" style="background: {PRIMARY}; color: white; padding: 1rem 2rem; border-radius: 25px; text-decoration: none; font-weight: 700; font-size: 1.1rem; display: inline-block;">
         🛒 ดูสินค้าทั้งหมดและสั่งซื้อ
@@ -1069,56 +2036,19 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-# ===== PRODUCT SALES FUNNEL =====
-if R["net"] > 0 and not st.session_state.get("product_viewed", False):
-    st.markdown("---")
-
-    # Calculate potential savings
-    current_cogs = parse_money(st.session_state.cases[active]["cogs_thb"])
-    premium_cogs = 25  # Our premium ingredient cost
-    monthly_savings = max(0, (current_cogs - premium_cogs) * R["cups_day"] * R["days"])
-
-    if monthly_savings > 1000:  # Show offer if significant savings
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, {SUCCESS} 0%, {PRIMARY} 100%); 
-                    color: white; border-radius: 20px; padding: 2rem; text-align: center; margin: 2rem 0;">
-            <h3 style="margin-bottom: 1rem;">🎉 คุณสามารถประหยัดได้!</h3>
-            <div style="font-size: 1.2rem; margin-bottom: 1rem;">
-                <strong>฿{monthly_savings:,.0f}/เดือน</strong> ด้วยวัตถุดิบพรีเมียม
-            </div>
-            <div style="margin-bottom: 1.5rem; opacity: 0.9;">
-                • คุณภาพสูงกว่า รสชาติดีกว่า<br>
-                • ราคาโรงงาน ไม่ผ่านตัวกลาง<br>
-                • ส่งตรงถึงร้าน บริการครบจบ
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("🛒 ดูสินค้าและราคา", type="primary", use_container_width=True):
-                track_user_action("product_interest", {"potential_savings": monthly_savings})
-                st.session_state.product_viewed = True
-                # Redirect to purchase page
-                st.markdown(f'<meta http-equiv="refresh" content="0;url={PURCHASE_URL}">', unsafe_allow_html=True)
-                st.success("🔄 กำลังเปิดหน้าสั่งซื้อ...")
-
-    else:
-        st.info(f"💡 ดูวัตถุดิบพรีเมียมที่ [CoffeePortals.com]({PURCHASE_URL}) เพื่อเพิ่มคุณภาพและลดต้นทุน")
-
 # ===== EXPORT & PRODUCT CATALOG =====
-st.markdown("---")
-st.markdown("### 📤 ผลลัพธ์และแคตตาล็อกสินค้า")
+profiled_markdown("---")
+profiled_markdown("### 📤 ผลลัพธ์และแคตตาล็อกสินค้า")
 
 export_col1, export_col2, export_col3 = st.columns(3)
 
 # ===== FOOTER WITH SOCIAL PROOF =====
-st.markdown("---")
+profiled_markdown("---")
 
 footer_col1, footer_col2, footer_col3 = st.columns(3)
 
 with footer_col1:
-    st.markdown(f"""
+    profiled_markdown(f"""
     **🛒 สั่งซื้อสินค้า**
     - 🌐 [ดูแคตตาล็อกเต็ม]({PURCHASE_URL})
     - 📞 ไลน์ไอดี: rathnagorn
@@ -1126,7 +2056,7 @@ with footer_col1:
     """)
 
 with footer_col2:
-    st.markdown("""
+    profiled_markdown("""
     **☕ ผลิตภัณฑ์ยอดนิยม**
     - ✅ เมล็ดกาแฟคั่วพรีเมียม
     - ✅ ไซรัปสำหรับทำกาแฟ
@@ -1134,13 +2064,13 @@ with footer_col2:
     """)
 
 with footer_col3:
-    st.markdown(f"""
+    profiled_markdown(f"""
     **📚 ข้อมูลเพิ่มเติม**
     - 📺 [วิดีโอแนะนำ]({YOUTUBE_URL})
     - 📊 เครื่องมือคำนวณ (หน้านี้)
     """)
 
-st.markdown(f"""
+profiled_markdown(f"""
 <div style="text-align: center; padding: 2rem 0; color: {TEXT_SECONDARY}; border-top: 1px solid #e2e8f0; margin-top: 2rem;">
     <div style="font-size: 0.9rem; margin-bottom: 0.5rem;">
         Made with ❤️ by <a href="{COFFEE_URL}" target="_blank" style="color: {PRIMARY}; font-weight: 600;">CoffeePortals Team</a>
@@ -1149,4 +2079,57 @@ st.markdown(f"""
         Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M')} | Version 1.0 Started
     </div>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# ===== ADMIN: RERUN PROFILER =====
+def rollup_summaries():
+    """Offline analytics rollups (analytics_rollup.py) - read from Parquet, never recomputed here"""
+    from analytics_rollup import load_summaries
+
+    summaries = load_summaries(ANALYTICS_SUMMARY_DIR)
+    profiled_markdown("**Analytics rollup**")
+    if not summaries:
+        st.caption(f"ยังไม่มีสรุปใน {ANALYTICS_SUMMARY_DIR} - รัน python analytics_rollup.py")
+        return
+    if "funnel" in summaries:
+        st.dataframe(summaries["funnel"], use_container_width=True, hide_index=True)
+    if "sessions_per_day" in summaries:
+        st.line_chart(summaries["sessions_per_day"], x="date", y="sessions")
+    if "savings_stats" in summaries:
+        st.dataframe(summaries["savings_stats"], use_container_width=True, hide_index=True)
+
+
+def admin_panel():
+    """Profiler, cache and session-memory report for ?admin=1"""
+    import pandas as pd
+
+    with st.expander("🛠️ Admin: rerun profiler", expanded=True):
+        report = profiler.summary()
+        report["caches"] = {"results": result_cache.stats(), "figures": figure_cache.stats(),
+                            "analytics": get_event_pipeline().stats(), "worker_pool": get_worker_pool().stats(),
+                            "jobs": get_job_queue().stats()}
+        st.caption(f"{report['runs']:,} runs profiled (window {report['window']}) - "
+                   f"numbers cover runs before this one; fragment reruns show up as run:<fragment>")
+        profiled_markdown("**Sections (ms)**")
+        st.dataframe(pd.DataFrame(report["sections_ms"]).T, use_container_width=True)
+        profiled_markdown("**Per-run counters**")
+        st.dataframe(pd.DataFrame(report["counters"]).T, use_container_width=True)
+        st.json(report["caches"], expanded=False)
+        report["sessions"] = get_session_registry().report()
+        report["this_session"] = dict(sorted(session_sizes().items(), key=lambda kv: -kv[1])[:15])
+        profiled_markdown("**Sessions (bytes)**")
+        st.json({"server": report["sessions"], "this_session": report["this_session"]}, expanded=False)
+        rollup_summaries()
+        st.download_button(
+            "⬇️ Export JSON",
+            json.dumps(dict(report, exported_at=datetime.now().isoformat()), indent=1),
+            file_name=f"rerun_profile_{datetime.now():%Y%m%d_%H%M%S}.json",
+            mime="application/json"
+        )
+
+
+if profiling_enabled():
+    admin_panel()
+
+profiler.record("run:full", _run_start)
+profiler.finish()
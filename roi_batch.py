@@ -0,0 +1,180 @@
+"""Evaluate a whole spreadsheet of cases with the dashboard's ROI model.
+
+Reads a CSV or Parquet file whose columns are named like roi_engine.FIELDS (price,
+cups, rent, ...; raw strings such as "฿35,000" or "30%" are parsed the same way as
+in the dashboard, and missing columns take the dashboard defaults). The file is
+streamed in chunks, so memory stays flat however many rows it has, and each chunk
+is evaluated in one vectorized calc_batch call - on several worker processes when
+the file spans more than one chunk.
+
+Each output row holds the input's non-FIELDS columns (a location name, say),
+followed by revenue, net, bep_day, payback, roi_annual and the industry benchmark
+tiers the dashboard shows. Rows keep the input order.
+
+Usage:
+  python roi_batch.py locations.csv results.parquet
+  python roi_batch.py locations.parquet results.csv --chunk-rows 50000 --workers 4
+"""
+import argparse
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from roi_engine import DEFAULTS, FIELDS, PARSE_DEFAULTS, benchmark_tiers, calc_batch, parse_case, parse_money_series
+
+CHUNK_ROWS = 100_000
+RESULT_COLUMNS = ["revenue", "net", "bep_day", "payback", "roi_annual"]
+# Output column -> (benchmark metric, calc_batch result it is judged on)
+TIER_COLUMNS = {
+    "margin_tier": ("gross_margin", "gp_margin"),
+    "payback_tier": ("payback_months", "payback"),
+    "sales_tier": ("daily_sales", "cups_day"),
+}
+
+
+# ===== READING =====
+def file_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".csv", ".txt"):
+        return "csv"
+    raise ValueError(f"Unsupported file type: {path} (expected .csv or .parquet)")
+
+
+def iter_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """Yield the input as DataFrames of at most `chunk_rows` rows"""
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Everything as text, blanks kept as "": parsing follows the dashboard's rules
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+
+
+# ===== EVALUATION =====
+def parse_column(values: pd.Series, field: str) -> np.ndarray:
+    """One FIELDS column as floats; a blank cogs_thb becomes NaN ("use cogs_pct"), like parse_case"""
+    default = PARSE_DEFAULTS.get(field, 0.0)
+    return parse_money_series(values, default, np.nan if field == "cogs_thb" else default).to_numpy()
+
+
+def evaluate_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Model results for every row of `df`, next to its non-FIELDS columns"""
+    if not any(f in df.columns for f in FIELDS):
+        raise ValueError(f"No model columns in the input - expected some of: {', '.join(FIELDS)}")
+    defaults = parse_case(DEFAULTS)
+    out = calc_batch({f: parse_column(df[f], f) if f in df.columns else defaults[f] for f in FIELDS})
+
+    result = df.drop(columns=[f for f in FIELDS if f in df.columns]).reset_index(drop=True)
+    for name in RESULT_COLUMNS:
+        result[name] = np.broadcast_to(out[name], len(df))
+    for name, (metric, source) in TIER_COLUMNS.items():
+        result[name] = benchmark_tiers(metric, np.broadcast_to(out[source], len(df)))
+    return result
+
+
+def evaluate_chunks(chunks, workers: int = 1):
+    """evaluate_chunk over an iterable of chunks, in order.
+
+    With more than one worker the chunks are spread over a process pool, but only
+    2 x workers of them are in flight at once, so memory stays bounded however
+    long the input is. A single-chunk input never starts the pool.
+    """
+    chunks = iter(chunks)
+    head = list(itertools.islice(chunks, 2))
+    if workers <= 1 or len(head) < 2:
+        yield from map(evaluate_chunk, itertools.chain(head, chunks))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in itertools.chain(head, chunks):
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(evaluate_chunk, chunk))
+        while pending:
+            yield pending.popleft().result()
+
+
+# ===== OUTPUT =====
+class ResultWriter:
+    """Appends result chunks to a CSV or Parquet file; the first chunk fixes the columns"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = file_format(path)
+        self.rows = 0
+        self._tmp = f"{path}.tmp"
+        self._parquet = None
+
+    def write(self, df: pd.DataFrame):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self._tmp, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self._tmp, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        # Written under a temporary name and renamed, so a failed run never leaves half a file
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self.rows:
+            pd.DataFrame(columns=RESULT_COLUMNS + list(TIER_COLUMNS)).to_csv(self._tmp, index=False)
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def run(input_path: str, output_path: str, chunk_rows: int = CHUNK_ROWS, workers: int = 1) -> dict:
+    """Evaluate every row of `input_path` into `output_path`"""
+    t0 = time.perf_counter()
+    writer = ResultWriter(output_path)
+    chunks = 0
+    try:
+        for result in evaluate_chunks(iter_chunks(input_path, chunk_rows), workers):
+            writer.write(result)
+            chunks += 1
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return {"rows": writer.rows, "chunks": chunks, "seconds": time.perf_counter() - t0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the ROI model for every row of a CSV/Parquet file")
+    parser.add_argument("input", help="CSV or Parquet file with columns named like the model fields")
+    parser.add_argument("output", help="where to write results (.csv or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read and evaluated per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for inputs larger than one chunk (default: all cores)")
+    args = parser.parse_args(argv)
+
+    summary = run(args.input, args.output, chunk_rows=args.chunk_rows, workers=args.workers)
+    rate = summary["rows"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"evaluated {summary['rows']:,} rows in {summary['chunks']} chunks, "
+          f"{summary['seconds']:.1f}s ({rate:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
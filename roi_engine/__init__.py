@@ -0,0 +1,25 @@
+"""Coffee-shop ROI engine behind performance_dashboard.py.
+
+Pure calculation code with no Streamlit import and no work at import time, so it
+loads in a few milliseconds (numpy is the only dependency; pandas is imported
+only by the functions that return DataFrames/Series). Usable from scripts,
+batch jobs and benchmarks as well as from the dashboard.
+"""
+from .parsing import parse_money, parse_count, pct_to_float, parse_money_series
+from .model import (
+    DEFAULTS, FIELDS, FIELD_LABELS, PARSE_DEFAULTS, INDUSTRY_BENCHMARKS, TIER_LABELS,
+    get_industry_benchmark, benchmark_tiers,
+    parse_case, CASE_DTYPE, parse_record, calc_batch, calc_case, case_columns, calc_many, calc_records,
+    case_key, ResultCache,
+)
+from .analysis import (
+    MAX_SWEEP_POINTS, MAX_GRID, parse_sweep_range, sensitivity_sweep, sensitivity_grid, tornado,
+    GOAL_METRICS, LINEAR_FIELDS, GOAL_BRACKETS, goal_seek,
+)
+from .montecarlo import (
+    MC_FIELDS, MC_DISTS, MC_CHUNK, MC_MAX_SAMPLES, dist_spec, draw_samples, mc_blocks, mc_block, mc_summary, monte_carlo,
+)
+from .projection import project_cashflows
+from .pool import POOL_WORKERS, Job, WorkerPool
+from .jobs import MAX_RUNNING, MAX_PER_OWNER, JobCancelled, BackgroundJob, JobQueue
+from .share import SHARE_VERSION, MAX_TOKEN_CHARS, MAX_VALUE_CHARS, encode_cases, decode_cases
@@ -0,0 +1,154 @@
+"""Sensitivity sweeps, tornado ranking and goal seek on top of calc_batch."""
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .model import FIELDS, FIELD_LABELS, _pct, calc_batch, parse_case
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Sensitivity sweeps are capped so a pasted list can't stall a rerun. Latency
+# budget: 10k points must evaluate in under 10 ms (calc_batch takes ~1 ms);
+# beyond that the chart, not the math, dominates the rerun.
+MAX_SWEEP_POINTS = 10_000
+
+
+def parse_sweep_range(text: str, points: int = 20) -> np.ndarray:
+    """Parse "lo-hi" (evenly spaced points) or "a,b,c" into sweep values"""
+    points = max(2, min(int(points), MAX_SWEEP_POINTS))
+    if "-" in text:
+        try:
+            lo, hi = map(int, text.split("-"))
+            return np.linspace(lo, hi, points)
+        except:
+            return np.linspace(50, 400, 20)
+    try:
+        return np.array([int(x.strip()) for x in text.split(",")], dtype=float)[:MAX_SWEEP_POINTS]
+    except:
+        return np.linspace(50, 400, 20)
+
+
+def sensitivity_sweep(vals: dict, field: str, points) -> np.ndarray:
+    """Net profit of a case with `field` set to each value in `points`, in one batched call"""
+    cols = parse_case(vals)
+    cols[field] = np.asarray(points, dtype=float)
+    return calc_batch(cols)["net"]
+
+
+MAX_GRID = 500  # per axis, so at most 250k cells
+
+
+def sensitivity_grid(vals: dict, x_field: str, x_points, y_field: str, y_points, metric: str = "net") -> np.ndarray:
+    """`metric` over a len(y_points) x len(x_points) grid in one broadcast calc_batch call"""
+    cols = parse_case(vals)
+    cols[x_field] = np.asarray(x_points, dtype=float)[np.newaxis, :]
+    cols[y_field] = np.asarray(y_points, dtype=float)[:, np.newaxis]
+    return calc_batch(cols)[metric]
+
+
+def tornado(vals: dict, steps=(0.1,)) -> "pd.DataFrame":
+    """One-at-a-time sensitivity: each FIELD moved by ±step with the rest at baseline.
+
+    All 2 x len(FIELDS) x len(steps) perturbations run in a single calc_batch call.
+    Returns one row per (step, field), ranked by net-profit swing within each step.
+    """
+    import pandas as pd
+
+    base = parse_case(vals)
+    steps = np.asarray(steps, dtype=float)
+    # Axis layout: (step, perturbed field, low/high side)
+    cols = {f: np.full((len(steps), len(FIELDS), 2), base[f]) for f in FIELDS}
+    for i, f in enumerate(FIELDS):
+        cols[f][:, i, 0] = base[f] * (1 - steps)
+        cols[f][:, i, 1] = base[f] * (1 + steps)
+    out = calc_batch(cols)
+
+    df = pd.DataFrame({
+        "field": np.tile(FIELDS, len(steps)),
+        "step": np.repeat(steps, len(FIELDS)),
+        "net_low": out["net"][..., 0].ravel(),
+        "net_high": out["net"][..., 1].ravel(),
+        "payback_low": out["payback"][..., 0].ravel(),
+        "payback_high": out["payback"][..., 1].ravel(),
+    })
+    df["net_swing"] = (df["net_high"] - df["net_low"]).abs()
+    df["payback_swing"] = (df["payback_high"] - df["payback_low"]).abs()
+    return df.sort_values(["step", "net_swing"], ascending=[True, False], ignore_index=True)
+
+
+GOAL_METRICS = {"net": "กำไรสุทธิ (บาท/เดือน)", "payback": "Payback (เดือน)", "roi_annual": "ROI ต่อปี (0.3 = 30%)"}
+# op is exactly linear in these fields, so two engine probes give the closed-form answer
+LINEAR_FIELDS = ["price", "cups", "cogs_thb", "pack", "rent", "staff", "utils", "mkt", "others"]
+# Everything else that moves net profit is solved by a bracketed search on the batch engine
+GOAL_BRACKETS = {"days": (1, 31), "cogs_pct": (0.0, 1.0), "app_fee_pct": (0.0, 1.0), "tax_pct": (0.0, 1.0)}
+
+
+def goal_seek(vals: dict, field: str, metric: str, target: float) -> dict:
+    """Value of `field` that makes `metric` (net, payback or roi_annual) hit `target`.
+
+    Returns {"ok", "value", "method", "achieved", "message"}; when there is no
+    feasible answer `ok` is False and `message` says why.
+    """
+    base = parse_case(vals)
+    now = {k: v.item() for k, v in calc_batch(base).items()}
+    label = FIELD_LABELS[field]
+
+    def fail(message):
+        return {"ok": False, "value": None, "method": None, "achieved": None, "message": message}
+
+    def solved(value, method):
+        achieved = calc_batch(dict(base, **{field: value}))[metric].item()
+        return {"ok": True, "value": float(value), "method": method, "achieved": achieved, "message": ""}
+
+    # Payback and ROI targets translate into a required net profit - unless capex is the unknown
+    if metric != "net" and target <= 0:
+        return fail("เป้าหมายต้องมากกว่า 0")
+    if field == "capex":
+        if metric == "net":
+            return fail("เงินลงทุนตั้งต้นไม่มีผลต่อกำไรสุทธิรายเดือน")
+        if now["net"] <= 0:
+            return fail("กำไรสุทธิยังไม่เป็นบวก - ไม่มีเงินลงทุนใดที่คืนทุนได้")
+        return solved(target * now["net"] if metric == "payback" else 12 * now["net"] / target, "closed-form")
+    if metric == "net":
+        target_net = target
+    elif base["capex"] <= 0:
+        return fail("ต้องมีเงินลงทุนตั้งต้นมากกว่า 0 จึงจะคำนวณ Payback/ROI ได้")
+    else:
+        target_net = base["capex"] / target if metric == "payback" else target * base["capex"] / 12
+
+    if field in LINEAR_FIELDS:
+        # Undo the tax on positive profit, then solve op(x) = a + b * x for x
+        tax_pct = _pct(base["tax_pct"]).item()
+        if target_net > 0 and tax_pct >= 1:
+            return fail("ภาษี 100% - กำไรหลังภาษีเป็นบวกไม่ได้")
+        target_op = target_net if target_net <= 0 else target_net / (1 - tax_pct)
+        op0, op1 = calc_batch(dict(base, **{field: np.array([0.0, 1.0])}))["op"]
+        if op1 == op0:
+            return fail(f"{label} ไม่มีผลต่อกำไรในเคสนี้ (เช่น ยอดขายเป็น 0)")
+        value = (target_op - op0) / (op1 - op0)
+        if value < 0:
+            if field == "cups" and now["contrib"] <= 0:
+                return fail("กำไรต่อแก้วติดลบหรือเป็นศูนย์ (contrib ≤ 0) - ขายเพิ่มเท่าไรก็ไม่ถึงเป้า "
+                            "ต้องปรับราคาหรือต้นทุนก่อน")
+            return fail(f"ต้องใช้ {label} ติดลบ ({value:,.2f}) - ไม่มีคำตอบที่เป็นไปได้")
+        return solved(value, "closed-form")
+
+    if field not in GOAL_BRACKETS:
+        return fail(f"{label} ไม่มีผลต่อกำไรสุทธิรายเดือน")
+    lo, hi = GOAL_BRACKETS[field]
+    discrete = field == "days"
+    grid = np.arange(lo, hi + 1, dtype=float) if discrete else np.linspace(lo, hi, 1001)
+    # Each pass narrows the first sign change 1000x, so three passes reach ~1e-9 of the bracket
+    for _ in range(1 if discrete else 3):
+        gap = calc_batch(dict(base, **{field: grid}))["net"] - target_net
+        if np.all(gap == gap[0]):
+            return fail(f"{label} ไม่มีผลต่อกำไรในเคสนี้")
+        idx = np.flatnonzero((gap == 0) | (np.sign(gap) != np.sign(gap[0])))
+        if len(idx) == 0:
+            return fail(f"ไม่มีค่า {label} ในช่วง {lo:g}–{hi:g} ที่ทำให้ถึงเป้าหมาย")
+        i = idx[0]
+        if discrete or gap[i] == 0 or i == 0:
+            return solved(grid[i], "bracketed")
+        grid = np.linspace(grid[i - 1], grid[i], 1001)
+    return solved(grid[-1], "bracketed")
@@ -0,0 +1,169 @@
+"""Background jobs: long evaluations run off the caller's thread, deduplicated by input hash."""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_RUNNING = 2  # jobs running at once per process; the rest wait in line
+MAX_PER_OWNER = 2  # unfinished jobs one owner (a browser session) may hold
+KEEP_FINISHED = 32  # finished jobs kept so their results can be re-attached to
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function once the job has been cancelled"""
+
+
+class BackgroundJob:
+    """One job's state, shared by every owner that attached to it.
+
+    The job's function receives it as its first argument and calls report() or
+    check() now and then; both raise JobCancelled once the job is cancelled.
+    status goes queued -> running -> done | failed | cancelled.
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"
+        self.done = self.total = 0
+        self.result = None
+        self.error = None
+        self.owners = set()
+        self._cancel = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def report(self, done: int, total: int):
+        self.done, self.total = done, total
+        self.check()
+
+    def follow(self, pool_job) -> list:
+        """Wait for a WorkerPool job, mirroring its progress; cancelling this cancels it too"""
+        try:
+            while not pool_job.wait(timeout=0.2):
+                self.report(pool_job.done, pool_job.total)
+        except BaseException:
+            pool_job.cancel()
+            raise
+        self.report(pool_job.done, pool_job.total)
+        return pool_job.result()
+
+
+class JobQueue:
+    """Runs jobs on a few background threads, one job per distinct input hash.
+
+    Submitting an id that is queued, running or done re-attaches to that job
+    instead of starting another, so a rerun - or a second user asking the same
+    question - picks up the same result; a job being cancelled is replaced by a
+    fresh one. At most `max_running` jobs run at once;
+    an owner holding more than `max_per_owner` unfinished jobs loses its oldest
+    ones, and a job nobody owns any more is cancelled.
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING, max_per_owner: int = MAX_PER_OWNER,
+                 keep_finished: int = KEEP_FINISHED):
+        self.max_running = max_running
+        self.max_per_owner = max_per_owner
+        self.keep_finished = keep_finished
+        self.submitted = self.reused = self.cancelled = self.failed = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_running, thread_name_prefix="roi-job")
+
+    def submit(self, job_id: str, fn, *args, owner=None) -> BackgroundJob:
+        """The job for `job_id`, starting fn(job, *args) unless it already exists"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # A cancelled job may still be running until it next checks in; it will end
+            # "cancelled", so it takes a fresh job rather than a re-attach
+            if job is not None and job.status in ("queued", "running", "done") and not job._cancel.is_set():
+                self.reused += 1
+            else:
+                job = self._jobs[job_id] = BackgroundJob(job_id)
+                self.submitted += 1
+                self._executor.submit(self._run, job, fn, args)
+            self._jobs.move_to_end(job_id)
+            if owner is not None:
+                job.owners.add(owner)
+                held = [j for j in self._jobs.values() if owner in j.owners and not j.finished]
+                for old in held[:-self.max_per_owner]:
+                    self._release(old, owner)
+            self._trim()
+        return job
+
+    def get(self, job_id: str) -> BackgroundJob:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def release(self, job_id: str, owner):
+        """Detach `owner` from a job; it is cancelled if it hasn't finished and nobody else waits"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._release(self._jobs[job_id], owner)
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            if job_id in self._jobs:
+                self._cancel(self._jobs[job_id])
+
+    def _release(self, job, owner):
+        job.owners.discard(owner)
+        if not job.owners:
+            self._cancel(job)
+
+    def _cancel(self, job):
+        if job.finished or job._cancel.is_set():
+            return
+        job._cancel.set()
+        self.cancelled += 1
+        if job.status == "queued":  # never started: no thread will report back
+            job.status = "cancelled"
+
+    def _trim(self):
+        # Oldest finished jobs go first; unfinished ones are never dropped
+        done = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in done[:max(0, len(done) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, fn, args):
+        with self._lock:
+            if job._cancel.is_set():
+                return
+            job.status = "running"
+        try:
+            result = fn(job, *args)
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            job.error, status = e, "failed"
+        else:
+            job.result, status = result, "done"
+        with self._lock:
+            job.status = status
+            if status == "failed":
+                self.failed += 1
+            self._trim()
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                self._cancel(job)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status = {s: 0 for s in ("queued", "running") + FINISHED}
+            for job in self._jobs.values():
+                by_status[job.status] += 1
+            return dict(by_status, max_running=self.max_running, submitted=self.submitted,
+                        reused=self.reused, cancelled=self.cancelled, failed=self.failed)
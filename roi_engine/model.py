@@ -0,0 +1,244 @@
+"""Input fields, defaults and the vectorized profit engine."""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .parsing import parse_money
+
+DEFAULTS = {
+    "price": "75", "cups": "180", "days": "26",
+    "cogs_thb": "28", "cogs_pct": "0", "pack": "2", "app_fee_pct": "0",
+    "rent": "35000", "staff": "70000", "utils": "12000", "mkt": "8000", "others": "5000",
+    "capex": "280000", "dep_years": "4", "tax_pct": "0"
+}
+
+FIELDS = ["price", "cups", "days", "cogs_thb", "cogs_pct", "pack", "app_fee_pct",
+          "rent", "staff", "utils", "mkt", "others", "capex", "dep_years", "tax_pct"]
+
+FIELD_LABELS = {
+    "price": "ราคา/แก้ว", "cups": "ยอดขาย (แก้ว/วัน)", "days": "วันเปิด/เดือน",
+    "cogs_thb": "วัตถุดิบ/แก้ว", "cogs_pct": "% วัตถุดิบ", "pack": "บรรจุภัณฑ์/แก้ว", "app_fee_pct": "% ค่าแอป",
+    "rent": "ค่าเช่า", "staff": "เงินเดือนพนักงาน", "utils": "ค่าสาธารณูปโภค", "mkt": "งบการตลาด",
+    "others": "ค่าใช้จ่ายอื่น", "capex": "เงินลงทุนตั้งต้น", "dep_years": "อายุการใช้งาน (ปี)", "tax_pct": "% ภาษี"
+}
+
+
+INDUSTRY_BENCHMARKS = {
+    "gross_margin": {"excellent": 0.65, "good": 0.55, "average": 0.45},
+    "payback_months": {"excellent": 12, "good": 18, "average": 24},
+    "daily_sales": {"excellent": 200, "good": 150, "average": 100}
+}
+TIER_LABELS = ["🏆 ดีเยี่ยม", "✅ ดี", "🔶 ปานกลาง", "⚠️ ต้องปรับปรุง"]
+
+
+def get_industry_benchmark(metric, value):
+    """Return industry benchmark comparison"""
+    if metric in INDUSTRY_BENCHMARKS:
+        return benchmark_tiers(metric, value).item()
+    return "📊 ไม่มีข้อมูลเปรียบเทียب"
+
+
+def benchmark_tiers(metric: str, values) -> np.ndarray:
+    """Tier label for each value; payback is better when lower, the other metrics when higher"""
+    bench = INDUSTRY_BENCHMARKS[metric]
+    values = np.asarray(values, dtype=float)
+    better = np.less_equal if metric == "payback_months" else np.greater_equal
+    hits = [better(values, bench[level]) for level in ("excellent", "good", "average")]
+    return np.select(hits, TIER_LABELS[:3], TIER_LABELS[3])
+
+
+# Fallbacks used when a field can't be parsed (everything else falls back to 0)
+PARSE_DEFAULTS = {"days": 26, "dep_years": 4}
+
+
+# A parsed case as one record of 15 float64s (120 bytes) rather than a dict of strings.
+# Records index like parse_case's dict, and an array of them is itself a calc_batch
+# column mapping (records["price"] is the price column).
+CASE_DTYPE = np.dtype([(f, np.float64) for f in FIELDS])
+_FIELD_DEFAULTS = [PARSE_DEFAULTS.get(f, 0.0) for f in FIELDS]
+_COGS_THB = FIELDS.index("cogs_thb")
+
+
+def _row(vals: dict) -> tuple:
+    # One case's parsed FIELDS in order: the shared core of parse_case and parse_record
+    row = [parse_money(vals[f], d) for f, d in zip(FIELDS, _FIELD_DEFAULTS)]
+    # Blank cogs_thb means "use cogs_pct of price" - marked with NaN for the batch engine
+    if str(vals["cogs_thb"]).strip() == "":
+        row[_COGS_THB] = np.nan
+    return tuple(row)
+
+
+def parse_case(vals: dict) -> dict:
+    """Parse one case's raw strings into the numeric columns calc_batch expects.
+
+    An already-parsed record (parse_record) is accepted too and just unpacked.
+    """
+    if isinstance(vals, np.void):
+        return dict(zip(FIELDS, vals.tolist()))
+    return dict(zip(FIELDS, _row(vals)))
+
+
+def parse_record(vals: dict) -> np.void:
+    """parse_case as a single CASE_DTYPE record"""
+    return np.array(_row(vals), dtype=CASE_DTYPE)[()]
+
+
+def _where(cond, a, b):
+    # np.where, except that a single case (numpy scalars) stays a scalar: np.where would
+    # return a 0-d array, which costs microseconds per call and slows every later operation
+    if isinstance(cond, np.bool_):
+        return np.float64(a if cond else b)
+    return np.where(cond, a, b)
+
+
+def _pct(v):
+    # Vectorized pct_to_float: values above 1 are treated as whole percentages
+    return _where(v <= 1, v, v / 100.0)
+
+
+def calc_batch(cols: dict) -> dict:
+    """Evaluate any number of cases in one vectorized pass.
+
+    `cols` maps every name in FIELDS to a number or array of parsed values (see
+    parse_case). Inputs are broadcast together, so a scalar base case can be
+    combined with an array of cups or a price x cups grid; a single case of
+    floats comes back as numpy scalars. Returns a dict of arrays keyed like
+    calc_case's result, with the same edge-case rules:
+    bep_day is NaN when contrib <= 0, payback is inf when net <= 0, and margins
+    and ROI are 0 when revenue/capex is not positive.
+    """
+    values = [cols[f] for f in FIELDS]
+    if all(isinstance(v, float) for v in values):
+        # One parsed case: numpy scalars skip the broadcast and are far cheaper than 0-d arrays
+        c = dict(zip(FIELDS, map(np.float64, values)))
+    else:
+        c = dict(zip(FIELDS, np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in values])))
+
+    price = c["price"]
+    cups_day = c["cups"]
+    days = np.maximum(1, np.trunc(c["days"]))
+
+    cogs_pct = _pct(c["cogs_pct"])
+    app_fee = _pct(c["app_fee_pct"])
+    capex = c["capex"]
+    dep_years = np.maximum(1, np.trunc(c["dep_years"]))
+    tax_pct = _pct(c["tax_pct"])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Calculate variable costs
+        base_cogs = _where(np.isnan(c["cogs_thb"]), price * cogs_pct, c["cogs_thb"])
+        var_cup = base_cogs + c["pack"] + (price * app_fee)
+        contrib = price - var_cup
+
+        # Monthly calculations
+        cups_month = cups_day * days
+        revenue = price * cups_month
+        var_total = var_cup * cups_month
+        gp = revenue - var_total
+        fixed = c["rent"] + c["staff"] + c["utils"] + c["mkt"] + c["others"]
+        op = gp - fixed
+        tax = _where(op > 0, op, 0.0) * tax_pct
+        net = op - tax
+
+        # Additional metrics
+        depr = capex / (dep_years * 12)
+        bep_day = _where(contrib <= 0, np.nan, fixed / contrib / days)
+        payback = _where(net > 0, capex / net, np.inf)
+
+        # Ratios and margins
+        gp_margin = _where(revenue > 0, gp / revenue, 0.0)
+        net_margin = _where(revenue > 0, net / revenue, 0.0)
+        roi_annual = _where(capex > 0, (net * 12) / capex, 0.0)
+
+    return dict(
+        price=price, cups_day=cups_day, days=days, revenue=revenue, var_total=var_total,
+        gp=gp, fixed=fixed, op=op, tax=tax, net=net, contrib=contrib, bep_day=bep_day,
+        payback=payback, var_cup=var_cup, depr=depr, gp_margin=gp_margin,
+        net_margin=net_margin, roi_annual=roi_annual
+    )
+
+
+def calc_case(vals: dict) -> dict:
+    """Single-case wrapper around calc_batch returning plain Python scalars"""
+    out = {k: v.item() for k, v in calc_batch(parse_case(vals)).items()}
+    out["days"] = int(out["days"])
+    return out
+
+
+def case_columns(cases: list) -> dict:
+    """Columnar store for many cases: one float array per FIELD, ready for calc_batch"""
+    records = np.array([_row(vals) for vals in cases], dtype=CASE_DTYPE)
+    return {f: records[f] for f in FIELDS}
+
+
+def calc_many(cases: list) -> list:
+    """calc_case for a list of cases, evaluated in a single calc_batch call"""
+    return calc_records(np.array([_row(vals) for vals in cases], dtype=CASE_DTYPE))
+
+
+def calc_records(records: np.ndarray) -> list:
+    """calc_many for cases that are already parsed: a CASE_DTYPE array"""
+    out = calc_batch(records)
+    keys, cols = list(out), [out[k].tolist() for k in out]
+    rows = [dict(zip(keys, row)) for row in zip(*cols)]
+    for row in rows:
+        row["days"] = int(row["days"])
+    return rows
+
+
+def case_key(vals: dict) -> str:
+    """Stable hash of a case's raw inputs (only FIELDS count)"""
+    raw = json.dumps([str(vals.get(f, "")) for f in FIELDS], ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU of calc_case results keyed by case_key, shared across sessions.
+
+    Returned dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, vals: dict) -> dict:
+        return self.get_many({0: vals})[0]
+
+    def get_many(self, cases: dict, keys: dict = None, records: dict = None) -> dict:
+        """Results for {cid: vals}; every miss is computed together in one calc_batch call.
+
+        Callers already holding each case's case_key or parsed record (parse_record)
+        can pass them as {cid: ...} so they aren't hashed or parsed again.
+        """
+        if keys is None:
+            keys = {cid: case_key(vals) for cid, vals in cases.items()}
+        out, missing = {}, []
+        with self._lock:
+            for cid, key in keys.items():
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    out[cid] = self._data[key]
+                else:
+                    self.misses += 1
+                    missing.append(cid)
+        if missing:
+            computed = calc_records(np.array([records[cid] if records else _row(cases[cid])
+                                              for cid in missing], dtype=CASE_DTYPE))
+            with self._lock:
+                for cid, result in zip(missing, computed):
+                    out[cid] = self._data[keys[cid]] = result
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return {cid: out[cid] for cid in cases}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
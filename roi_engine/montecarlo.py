@@ -0,0 +1,90 @@
+"""Monte Carlo risk summary: inputs drawn from distributions, evaluated in independent blocks."""
+import numpy as np
+
+from .model import FIELDS, calc_batch, parse_case
+
+MC_FIELDS = ["cups", "price", "cogs_thb", "rent"]
+MC_DISTS = ["normal", "triangular", "uniform"]
+MC_CHUNK = 50_000  # samples per calc_batch call - bounds the engine's temporaries to a few MB
+MC_MAX_SAMPLES = 1_000_000
+
+
+def dist_spec(kind: str, base: float, spread: float) -> tuple:
+    """Distribution spec centred on `base` with a relative spread (0.2 = ±20%)"""
+    lo, hi = sorted((base * (1 - spread), base * (1 + spread)))
+    if kind == "normal":
+        return ("normal", base, abs(base) * spread)
+    if kind == "triangular":
+        return ("triangular", lo, base, hi)
+    return ("uniform", lo, hi)
+
+
+def draw_samples(rng, spec: tuple, n: int) -> np.ndarray:
+    """n draws for ("normal", mean, sd), ("triangular", low, mode, high) or ("uniform", low, high)"""
+    kind, *params = spec
+    if kind == "normal":
+        x = rng.normal(params[0], params[1], n)
+    elif kind in ("triangular", "uniform"):
+        if params[-1] <= params[0]:  # zero-width range: numpy rejects it, so it's just a constant
+            return np.full(n, float(params[0]))
+        x = rng.triangular(*params, n) if kind == "triangular" else rng.uniform(*params, n)
+    else:
+        raise ValueError(f"Unknown distribution: {kind}")
+    return np.maximum(x, 0.0)  # every input is a non-negative quantity
+
+
+def mc_blocks(n: int) -> list:
+    """(start, size) of the MC_CHUNK-sized blocks that make up an n-sample run"""
+    n = int(min(max(n, 1), MC_MAX_SAMPLES))
+    return [(start, min(MC_CHUNK, n - start)) for start in range(0, n, MC_CHUNK)]
+
+
+def mc_block(vals: dict, dists: dict, seed: int, start: int, size: int) -> tuple:
+    """net and payback arrays for one block of samples (see mc_blocks).
+
+    Block b draws each field from its own stream, keyed (b, FIELDS index) under
+    `seed`, so blocks share no state and give the same samples whichever process
+    evaluates them, in whatever order - and adding or dropping one field's
+    distribution leaves every other field's samples as they were.
+    """
+    cols = parse_case(vals)
+    block = start // MC_CHUNK
+    for i, field in enumerate(FIELDS):
+        if field in dists:
+            ss = np.random.SeedSequence(seed, spawn_key=(block, i))
+            cols[field] = draw_samples(np.random.default_rng(ss), dists[field], size)
+    out = calc_batch(cols)
+    return np.broadcast_to(out["net"], size), np.broadcast_to(out["payback"], size)
+
+
+def mc_summary(net: np.ndarray, payback: np.ndarray, bins: int = 60) -> dict:
+    """Loss probability, P5/P50/P95 of net profit and payback, and a net-profit histogram"""
+    # inverted_cdf never interpolates, so percentiles stay exact samples (and inf-safe)
+    net_p5, net_p50, net_p95 = np.percentile(net, [5, 50, 95], method="inverted_cdf")
+    pb_p5, pb_p50, pb_p95 = np.percentile(payback, [5, 50, 95], method="inverted_cdf")
+    counts, edges = np.histogram(net, bins=bins)
+    return dict(
+        n=len(net), p_loss=float(np.mean(net < 0)),
+        net_p5=float(net_p5), net_p50=float(net_p50), net_p95=float(net_p95),
+        payback_p5=float(pb_p5), payback_p50=float(pb_p50), payback_p95=float(pb_p95),
+        hist_counts=counts, hist_edges=edges
+    )
+
+
+def monte_carlo(vals: dict, dists: dict, n: int = 100_000, seed: int = 42, bins: int = 60) -> dict:
+    """Risk summary for one case with some inputs drawn from distributions.
+
+    `dists` maps FIELDS to specs (see draw_samples); the other fields stay at the
+    case's values. Samples are drawn and evaluated one MC_CHUNK block at a time
+    so memory per calc_batch call stays bounded; the summary's exact percentiles
+    still need every sample's net and payback, 16 bytes a sample (16 MB at
+    MC_MAX_SAMPLES). The result is reproducible for a given seed, and evaluating
+    the blocks elsewhere (a worker pool) and passing them to mc_summary gives
+    exactly the same answer.
+    """
+    blocks = mc_blocks(n)
+    total = blocks[-1][0] + blocks[-1][1]
+    net, payback = np.empty(total), np.empty(total)
+    for start, size in blocks:
+        net[start:start + size], payback[start:start + size] = mc_block(vals, dists, seed, start, size)
+    return mc_summary(net, payback, bins)
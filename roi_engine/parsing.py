@@ -0,0 +1,66 @@
+"""Money and percentage parsing for the raw strings users type into the dashboard."""
+import re
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_MONEY_JUNK = str.maketrans("", "", "฿, ")
+_NON_NUMERIC = re.compile(r"[^0-9.\-]")
+_calls = threading.local()
+
+
+def parse_money(s: str, default: float = 0.0) -> float:
+    _calls.n = getattr(_calls, "n", 0) + 1
+    if s is None: return default
+    return _parse_money_cached(str(s), default)
+
+
+def _parse_money_raw(s: str, default: float) -> float:
+    s = s.strip()
+    if s == "": return default
+    neg = s.startswith("(") and s.endswith(")")
+    s = (s[1:-1] if neg else s).translate(_MONEY_JUNK)
+    try:
+        v = float(s[:-1]) / 100.0 if s.endswith("%") else float(_NON_NUMERIC.sub("", s))
+    except ValueError:
+        return default
+    if v != v:  # "nan%" gets past float(); NaN is reserved for "no value" (a blank cogs_thb)
+        return default
+    return -v if neg else v
+
+
+# Inputs are re-parsed on every rerun but rarely change, so memoize on the raw
+# string. Module state outlives script reruns, so the LRU is shared process-wide.
+_parse_money_cached = lru_cache(maxsize=4096)(_parse_money_raw)
+
+
+def parse_count() -> int:
+    """parse_money calls made so far on the current thread (for the rerun profiler)"""
+    return getattr(_calls, "n", 0)
+
+
+def pct_to_float(txt: str, default=0.0) -> float:
+    v = parse_money(txt, default)
+    return v if v <= 1 else v / 100.0
+
+
+def parse_money_series(values: "pd.Series", default: float = 0.0, blank: float = None) -> "pd.Series":
+    """parse_money for a whole column, with the same result for every element.
+
+    Spreadsheet columns repeat a lot (days, pack, fees...), so each distinct value is
+    parsed once by parse_money itself. Missing and blank entries become `blank`
+    (`default` unless given); a numeric column is taken as it is.
+    """
+    import pandas as pd
+
+    blank = default if blank is None else blank
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float).fillna(blank)
+    codes, uniques = pd.factorize(values)  # code -1 (missing) picks the trailing blank
+    parsed = [blank if str(u).strip() == "" else parse_money(u, default) for u in uniques]
+    return pd.Series(np.array(parsed + [blank], dtype=float)[codes], index=values.index, name=values.name)
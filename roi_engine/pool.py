@@ -0,0 +1,145 @@
+"""A bounded process pool for sharding large evaluations across cores."""
+import os
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Leave one core for the process that owns the pool (the Streamlit server, say)
+POOL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+TASKS_PER_WORKER = 2  # tasks a job keeps queued per worker; the rest wait their turn
+
+
+@contextmanager
+def _main_script_hidden():
+    # A spawned worker re-runs the parent's main script unless __main__ looks like a
+    # module named "__main__" - which the Streamlit app, run as a script, is not
+    main = sys.modules["__main__"]
+    spec = getattr(main, "__spec__", None)
+    if spec is None:
+        from importlib.machinery import ModuleSpec
+
+        main.__spec__ = ModuleSpec("__main__", None)
+    try:
+        yield
+    finally:
+        if spec is None:
+            main.__spec__ = None
+
+
+class Job:
+    """One evaluation split into tasks, fed to the pool a few at a time.
+
+    Only workers x TASKS_PER_WORKER tasks are queued at once, so several jobs can
+    share the pool and a cancelled job leaves almost nothing behind. Results keep
+    task order. A Job is driven by the thread that created it (wait/result/cancel).
+    """
+
+    def __init__(self, pool: "WorkerPool", fn, tasks: list):
+        self.total = len(tasks)
+        self.done = 0
+        self.cancelled = False
+        self._pool = pool
+        self._fn = fn
+        self._todo = deque(enumerate(tasks))
+        self._running = {}  # future -> task index
+        self._results = [None] * self.total
+        self._submit()
+
+    @property
+    def progress(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def finished(self) -> bool:
+        return self.done == self.total
+
+    def _submit(self):
+        limit = self._pool.workers * TASKS_PER_WORKER
+        while self._todo and len(self._running) < limit:
+            i, args = self._todo.popleft()
+            self._running[self._pool.submit(self._fn, *args)] = i
+
+    def wait(self, timeout: float = None) -> bool:
+        """Collect whatever finishes within `timeout` seconds; True once every task is done"""
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        if self.cancelled:
+            raise RuntimeError("Job was cancelled")
+        if self._running:
+            completed, _ = wait(list(self._running), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in completed:
+                self._results[self._running.pop(future)] = future.result()
+                self.done += 1
+            self._submit()
+        return self.finished
+
+    def result(self) -> list:
+        while not self.wait():
+            pass
+        return self._results
+
+    def cancel(self):
+        # Queued tasks are dropped; ones already running finish and are discarded
+        if self.cancelled or self.finished:
+            return
+        self.cancelled = True
+        self._todo.clear()
+        for future in self._running:
+            future.cancel()
+        self._running.clear()
+        with self._pool._lock:
+            self._pool.cancelled += 1
+
+
+class WorkerPool:
+    """Process pool shared by every caller in this process, started on first use.
+
+    Workers are spawned rather than forked, so they start clean even when the
+    parent runs threads (Streamlit does), and they never re-run the parent's main
+    script. A task must be a picklable function from an importable module; since
+    the pool evaluates the same functions as a single-process run, sharded results
+    are identical to unsharded ones.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS):
+        self.workers = workers
+        self.jobs = self.tasks = self.cancelled = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        from concurrent.futures.process import BrokenProcessPool
+
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self.tasks += 1
+            try:
+                # Workers are started on demand, inside submit
+                with _main_script_hidden():
+                    return self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory): start a fresh pool for the next caller
+                self._executor = None
+                raise
+
+    def map(self, fn, tasks: list) -> Job:
+        """Start a Job running fn(*args) for every args tuple in `tasks`"""
+        with self._lock:
+            self.jobs += 1
+        return Job(self, fn, tasks)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "started": self._executor is not None, "jobs": self.jobs,
+                    "tasks": self.tasks, "cancelled": self.cancelled}
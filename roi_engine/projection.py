@@ -0,0 +1,74 @@
+"""Month-by-month cash-flow projection with payback, NPV and IRR."""
+import numpy as np
+
+from .model import FIELDS, _pct, calc_batch
+
+
+def _irr_monthly(cash: np.ndarray, iters: int = 100) -> np.ndarray:
+    # Vectorized bisection on NPV(rate) per row; NaN where the bracket has no sign change
+    t = np.arange(cash.shape[-1])
+    lo = np.full(cash.shape[:-1], -0.99)
+    hi = np.full(cash.shape[:-1], 1.0)
+
+    def npv(rate):
+        return (cash / (1 + rate[..., None]) ** t).sum(axis=-1)
+
+    f_lo = npv(lo)
+    valid = np.sign(f_lo) != np.sign(npv(hi))
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        f_mid = npv(mid)
+        same = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(same, mid, lo), np.where(same, f_mid, f_lo)
+        hi = np.where(same, hi, mid)
+    return np.where(valid, (lo + hi) / 2, np.nan)
+
+
+def project_cashflows(cols: dict, months: int = 60, ramp_months: int = 0, ramp_start: float = 1.0,
+                      seasonality=None, rent_growth: float = 0.0, discount_rate: float = 0.10) -> dict:
+    """Monthly cash-flow projection, vectorized over cases x months.
+
+    `cols` holds parsed FIELDS as scalars or 1-D arrays of cases (see case_columns).
+    Volume ramps linearly from `ramp_start` of steady-state cups to 100% over
+    `ramp_months`, then follows 12 `seasonality` multipliers; rent rises by
+    `rent_growth` each year. Monthly P&L comes from calc_batch, except that
+    straight-line depreciation (capex over dep_years) is deducted before tax
+    while it lasts. Month 0 is the -capex outlay.
+
+    Returns arrays with a leading case axis: `cash` and `cumulative` of shape
+    (..., months + 1), monthly `revenue`/`op`/`tax`/`net`, plus `payback_month`
+    (first month cumulative cash is >= 0, NaN if never), `npv` at the annual
+    `discount_rate`, and `irr_annual`.
+    """
+    t = np.arange(1, months + 1)
+    ramp = np.ones(months) if ramp_months <= 0 else \
+        ramp_start + (1 - ramp_start) * np.minimum(1.0, (t - 1) / ramp_months)
+    season = np.ones(12) if seasonality is None else np.asarray(seasonality, dtype=float)
+    volume = ramp * season[(t - 1) % 12]
+    escalation = (1 + rent_growth) ** ((t - 1) // 12)
+
+    case_cols = {f: np.asarray(cols[f], dtype=float)[..., np.newaxis] for f in FIELDS}
+    month_cols = dict(case_cols, cups=case_cols["cups"] * volume, rent=case_cols["rent"] * escalation)
+    out = calc_batch(month_cols)
+
+    dep_months = np.maximum(1, np.trunc(case_cols["dep_years"])) * 12
+    depr = np.where(t <= dep_months, out["depr"], 0.0)
+    taxable = out["op"] - depr
+    tax = np.where(taxable > 0, taxable, 0.0) * _pct(case_cols["tax_pct"])
+    net = taxable - tax
+    operating_cash = out["op"] - tax  # depreciation is non-cash
+
+    capex = np.broadcast_to(case_cols["capex"], operating_cash.shape[:-1] + (1,))
+    cash = np.concatenate([-capex, operating_cash], axis=-1)
+    cumulative = np.cumsum(cash, axis=-1)
+
+    recovered = cumulative >= 0
+    payback_month = np.where(recovered.any(axis=-1), recovered.argmax(axis=-1), np.nan)
+    monthly_rate = (1 + discount_rate) ** (1 / 12) - 1
+    npv = (cash / (1 + monthly_rate) ** np.arange(months + 1)).sum(axis=-1)
+    irr_annual = (1 + _irr_monthly(cash)) ** 12 - 1
+
+    return dict(
+        cash=cash, cumulative=cumulative, revenue=out["revenue"], op=out["op"], tax=tax, net=net,
+        payback_month=payback_month, npv=npv, irr_annual=irr_annual
+    )
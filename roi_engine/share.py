@@ -0,0 +1,90 @@
+"""Compact, versioned tokens that carry a whole set of cases in a URL query parameter."""
+import base64
+import json
+import re
+import zlib
+
+from .model import DEFAULTS, FIELDS
+
+# Bump when the payload layout or DEFAULTS change: tokens only store differences from DEFAULTS
+SHARE_VERSION = "1"
+MAX_TOKEN_CHARS = 8000  # longer than any real link; anything bigger is rejected unread
+MAX_PAYLOAD_BYTES = 64 * 1024  # decompressed size limit
+MAX_VALUE_CHARS = 40
+_CASE_ID = re.compile(r"[A-Za-z0-9_]{1,8}")
+
+
+def encode_cases(cases: dict, active: str = None) -> str:
+    """URL-safe token for {cid: {field: raw string}} and the active case.
+
+    Only fields that differ from DEFAULTS are kept, as (FIELDS index, raw string)
+    pairs, so a case left at the defaults costs a few bytes. The JSON payload
+    [active index, [cid, i, value, ...], ...] is deflated and base64url-encoded
+    behind a one-character version.
+
+    Raises ValueError when decode_cases would reject the result - a case id it
+    doesn't accept, a value over MAX_VALUE_CHARS, or a payload or token over its size limit -
+    so every token handed out can be opened.
+    """
+    ids = list(cases)
+    payload = [ids.index(active) if active in cases else 0]
+    for cid, vals in cases.items():
+        if not (isinstance(cid, str) and _CASE_ID.fullmatch(cid)):
+            raise ValueError(f"Case id {cid!r} can't be shared")
+        entry = [cid]
+        for i, f in enumerate(FIELDS):
+            value = str(vals.get(f, DEFAULTS[f]))
+            if len(value) > MAX_VALUE_CHARS:
+                raise ValueError(f"Case {cid}: {f} is longer than {MAX_VALUE_CHARS} characters")
+            if value != DEFAULTS[f]:
+                entry += [i, value]
+        payload.append(entry)
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(raw) > MAX_PAYLOAD_BYTES:
+        raise ValueError(f"Share payload would be {len(raw):,} bytes, over {MAX_PAYLOAD_BYTES:,}")
+    token = SHARE_VERSION + base64.urlsafe_b64encode(zlib.compress(raw, 9)).decode().rstrip("=")
+    if len(token) > MAX_TOKEN_CHARS:
+        raise ValueError(f"Share token would be {len(token):,} characters, over {MAX_TOKEN_CHARS:,}")
+    return token
+
+
+def decode_cases(token: str, max_cases: int = None) -> tuple:
+    """(cases, active) from an encode_cases token.
+
+    Raises ValueError for tokens that are malformed, from another version, too
+    large or describing more than `max_cases` cases. Decoded cases hold every
+    FIELD, with DEFAULTS filled in for the ones the token leaves out.
+    """
+    if not token or len(token) > MAX_TOKEN_CHARS:
+        raise ValueError("Share token is empty or too long")
+    if token[0] != SHARE_VERSION:
+        raise ValueError(f"Unsupported share token version: {token[0]!r}")
+    body = token[1:]
+    try:
+        inflater = zlib.decompressobj()
+        raw = inflater.decompress(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)), MAX_PAYLOAD_BYTES)
+        if inflater.unconsumed_tail or not inflater.eof:
+            raise ValueError("payload too large or truncated")
+        payload = json.loads(raw)
+    except (ValueError, zlib.error) as e:
+        raise ValueError(f"Malformed share token: {e}") from None
+
+    if not isinstance(payload, list) or len(payload) < 2 or type(payload[0]) is not int:
+        raise ValueError("Malformed share token: bad layout")
+    cases = {}
+    for entry in payload[1:]:
+        if not (isinstance(entry, list) and len(entry) % 2 == 1 and isinstance(entry[0], str)
+                and _CASE_ID.fullmatch(entry[0]) and entry[0] not in cases):
+            raise ValueError("Malformed share token: bad case")
+        vals = DEFAULTS.copy()
+        for i, value in zip(entry[1::2], entry[2::2]):
+            if not (type(i) is int and 0 <= i < len(FIELDS) and isinstance(value, str)
+                    and len(value) <= MAX_VALUE_CHARS):
+                raise ValueError("Malformed share token: bad field")
+            vals[FIELDS[i]] = value
+        cases[entry[0]] = vals
+    if max_cases is not None and len(cases) > max_cases:
+        raise ValueError(f"Share token holds {len(cases)} cases, more than {max_cases}")
+    ids = list(cases)
+    active = ids[payload[0]] if 0 <= payload[0] < len(ids) else ids[0]
+    return cases, active
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def dash():
+    """performance_dashboard imported in bare mode, like benchmark.py: the page runs once with st.* as no-ops"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("ANALYTICS_SINK", "memory")
+        mp.syspath_prepend(ROOT)
+        import performance_dashboard
+        yield performance_dashboard
+    sys.modules.pop("performance_dashboard", None)
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from roi_engine import (DEFAULTS, FIELDS, GOAL_BRACKETS, LINEAR_FIELDS, MAX_SWEEP_POINTS, calc_case, goal_seek,
+                        parse_sweep_range, sensitivity_grid, sensitivity_sweep, tornado)
+
+CASES = [DEFAULTS, dict(DEFAULTS, tax_pct="20", cogs_thb=""), dict(DEFAULTS, cups="60", days="")]
+
+
+def net_with(vals: dict, field: str, value: float) -> float:
+    return calc_case(dict(vals, **{field: str(value)}))["net"]
+
+
+@pytest.mark.parametrize("vals", CASES)
+@pytest.mark.parametrize("field, points", [("cups", np.linspace(0, 400, 41)), ("price", [20, 55.5, 75, 120]),
+                                           ("rent", [0, 35000, 1e6])])
+def test_sweep_matches_calc_case_per_point(vals, field, points):
+    expected = [net_with(vals, field, p) for p in points]
+    np.testing.assert_allclose(sensitivity_sweep(vals, field, points), expected, rtol=1e-12)
+
+
+def test_grid_matches_calc_case_per_cell():
+    xs, ys = [40, 75, 110], [0, 150, 300, 450]
+    grid = sensitivity_grid(DEFAULTS, "price", xs, "cups", ys)
+    assert grid.shape == (len(ys), len(xs))
+    for i, y in enumerate(ys):
+        for j, x in enumerate(xs):
+            assert grid[i, j] == pytest.approx(calc_case(dict(DEFAULTS, price=str(x), cups=str(y)))["net"])
+
+
+def test_tornado_matches_calc_case_and_is_ranked():
+    df = tornado(DEFAULTS, steps=(0.1, 0.2))
+    assert len(df) == 2 * len(FIELDS)
+    row = df[(df["field"] == "price") & (df["step"] == 0.2)].iloc[0]
+    assert row["net_high"] == pytest.approx(net_with(DEFAULTS, "price", 90))
+    assert row["net_low"] == pytest.approx(net_with(DEFAULTS, "price", 60))
+    for _, step in df.groupby("step"):
+        assert step["net_swing"].is_monotonic_decreasing
+
+
+def test_parse_sweep_range():
+    np.testing.assert_array_equal(parse_sweep_range("100-200", 3), [100, 150, 200])
+    np.testing.assert_array_equal(parse_sweep_range("50, 80,120"), [50, 80, 120])
+    assert len(parse_sweep_range("0-1000", 10 ** 9)) == MAX_SWEEP_POINTS
+    np.testing.assert_array_equal(parse_sweep_range("abc"), np.linspace(50, 400, 20))
+
+
+@pytest.mark.parametrize("field", LINEAR_FIELDS)
+@pytest.mark.parametrize("tax", ["0", "20"])
+def test_linear_fields_are_solved_in_closed_form(field, tax):
+    vals = dict(DEFAULTS, tax_pct=tax)
+    target = calc_case(vals)["net"] + 5_000 if field in ("price", "cups") else calc_case(vals)["net"] - 5_000
+    res = goal_seek(vals, field, "net", target)
+    assert res["ok"] and res["method"] == "closed-form"
+    assert res["achieved"] == pytest.approx(target)
+    assert net_with(vals, field, res["value"]) == pytest.approx(target)
+
+
+@pytest.mark.parametrize("metric, target, net", [("payback", 2, 140_000), ("roi_annual", 3.0, 70_000)])
+def test_payback_and_roi_become_a_net_target(metric, target, net):
+    res = goal_seek(DEFAULTS, "cups", metric, target)
+    assert res["ok"] and res["achieved"] == pytest.approx(target)
+    assert net_with(DEFAULTS, "cups", res["value"]) == pytest.approx(net)
+
+
+def test_capex_is_closed_form_for_payback_and_roi():
+    net = calc_case(DEFAULTS)["net"]
+    assert goal_seek(DEFAULTS, "capex", "payback", 6)["value"] == pytest.approx(6 * net)
+    assert goal_seek(DEFAULTS, "capex", "roi_annual", 2.0)["value"] == pytest.approx(6 * net)
+    assert not goal_seek(DEFAULTS, "capex", "net", 1)["ok"]
+
+
+@pytest.mark.parametrize("field, vals", [
+    ("cogs_pct", dict(DEFAULTS, cogs_thb="")), ("app_fee_pct", DEFAULTS), ("tax_pct", DEFAULTS),
+])
+def test_bracketed_search_converges(field, vals):
+    target = 60_000 if field != "tax_pct" else calc_case(vals)["net"] * 0.9
+    res = goal_seek(vals, field, "net", target)
+    assert res["ok"] and res["method"] == "bracketed"
+    lo, hi = GOAL_BRACKETS[field]
+    assert lo <= res["value"] <= hi
+    assert res["achieved"] == pytest.approx(target, abs=1e-3)
+
+
+def test_days_search_returns_the_first_whole_day_that_reaches_the_target():
+    res = goal_seek(DEFAULTS, "days", "net", 100_000)
+    day = res["value"]
+    assert res["ok"] and day == int(day)
+    assert net_with(DEFAULTS, "days", day) >= 100_000 > net_with(DEFAULTS, "days", day - 1)
+
+
+def test_non_positive_contribution_cannot_be_sold_out_of():
+    res = goal_seek(dict(DEFAULTS, price="25"), "cups", "net", 10_000)
+    assert not res["ok"] and "contrib ≤ 0" in res["message"]
+
+
+@pytest.mark.parametrize("field, metric, target, vals, message", [
+    ("rent", "net", 500_000, DEFAULTS, "ติดลบ"),
+    ("days", "net", 10_000_000, DEFAULTS, "ในช่วง 1–31"),
+    ("cogs_pct", "net", 60_000, DEFAULTS, "ไม่มีผลต่อกำไรในเคสนี้"),
+    ("dep_years", "net", 60_000, DEFAULTS, "ไม่มีผลต่อกำไรสุทธิรายเดือน"),
+    ("price", "net", 60_000, dict(DEFAULTS, tax_pct="100"), "ภาษี 100%"),
+    ("price", "payback", 0, DEFAULTS, "มากกว่า 0"),
+    ("price", "payback", 6, dict(DEFAULTS, capex="0"), "เงินลงทุนตั้งต้นมากกว่า 0"),
+    ("capex", "payback", 6, dict(DEFAULTS, cups="60"), "ไม่เป็นบวก"),
+])
+def test_unreachable_targets_say_why(field, metric, target, vals, message):
+    res = goal_seek(vals, field, metric, target)
+    assert not res["ok"] and res["value"] is None
+    assert message in res["message"]
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "performance_dashboard.py")
+
+
+def event(action: str, session: str = "s1", **properties) -> dict:
+    return {"timestamp": f"2024-05-01T10:00:{len(properties):02d}", "action": action,
+            "properties": properties, "session_id": session}
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class BlockingSink:
+    """MemorySink whose writes wait on `gate`, so the flusher can be held mid-write"""
+
+    def __init__(self):
+        self.events, self.writing, self.gate = [], threading.Event(), threading.Event()
+
+    def write(self, events):
+        self.writing.set()
+        self.gate.wait(5)
+        self.events.extend(events)
+
+    def close(self):
+        pass
+
+
+def test_session_keeps_a_bounded_buffer(monkeypatch):
+    monkeypatch.setenv("ANALYTICS_SINK", "memory")
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    assert not at.exception
+    assert at.session_state.analytics.maxlen == 200
+    assert [e["action"] for e in at.session_state.analytics][-1] == "calculation_completed"
+
+
+def test_pipeline_flushes_in_batches_in_order(dash):
+    sink = dash.MemorySink()
+    pipeline = dash.EventPipeline(sink, batch=3, interval=0.02, coalesce={})
+    for i in range(7):
+        pipeline.emit(event("click", n=i))
+    wait_for(lambda: len(sink.events) == 7)
+    assert [e["properties"]["n"] for e in sink.events] == list(range(7))
+    assert pipeline.stats() == {"queued": 0, "pending": 0, "enqueued": 7, "coalesced": 0, "flushed": 7,
+                                "dropped": 0, "errors": 0}
+
+
+def test_full_queue_drops_instead_of_blocking(dash):
+    sink = BlockingSink()
+    pipeline = dash.EventPipeline(sink, maxsize=2, batch=1, interval=0.01, coalesce={})
+    pipeline.emit(event("click", n=0))
+    assert sink.writing.wait(5)  # the flusher is stuck writing event 0
+    for i in range(1, 5):
+        pipeline.emit(event("click", n=i))
+    assert pipeline.stats()["dropped"] == 2 and pipeline.stats()["queued"] == 2
+    sink.gate.set()
+    wait_for(lambda: len(sink.events) == 3)
+    assert [e["properties"]["n"] for e in sink.events] == [0, 1, 2]
+
+
+def test_sink_errors_are_counted_not_raised(dash):
+    class Broken(dash.EventSink):
+        def write(self, events):
+            raise OSError("disk full")
+
+    pipeline = dash.EventPipeline(Broken(), interval=0.01, coalesce={})
+    pipeline.emit(event("click"))
+    wait_for(lambda: pipeline.stats()["errors"] == 1)
+    assert pipeline.stats()["dropped"] == 1 and pipeline.stats()["flushed"] == 0
+
+
+def test_jsonl_and_sqlite_sinks(dash, tmp_path):
+    events = [event("a"), dict(event("b"), timestamp="2024-05-02T09:00:00"), event("c", note="ร้าน")]
+    dash.make_sink(f"jsonl:{tmp_path / 'jsonl'}").write(events)
+    with open(tmp_path / "jsonl" / "events-2024-05-01.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["action"] for line in f] == ["a", "c"]
+    assert (tmp_path / "jsonl" / "events-2024-05-02.jsonl").exists()
+
+    sink = dash.make_sink(f"sqlite:{tmp_path / 'events.db'}")
+    sink.write(events)
+    sink.close()
+    with sqlite3.connect(tmp_path / "events.db") as conn:
+        rows = conn.execute("SELECT action, properties FROM events").fetchall()
+    assert rows == [("a", "{}"), ("b", "{}"), ("c", '{"note": "ร้าน"}')]
+
+    assert isinstance(dash.make_sink("memory"), dash.MemorySink)
+    with pytest.raises(ValueError):
+        dash.make_sink("kafka:events")
+
+
+def test_burst_coalesces_into_one_record_per_session(dash):
+    sink = dash.MemorySink()
+    pipeline = dash.EventPipeline(sink, interval=0.01, coalesce={"calc": 60.0})
+    for i in range(5):
+        pipeline.emit(dict(event("calc", cases=i), timestamp=f"2024-05-01T10:00:0{i}"))
+    pipeline.emit(event("calc", session="s2", cases=9))
+    pipeline.emit(event("click"))
+    wait_for(lambda: len(sink.events) == 1)
+    assert sink.events[0]["action"] == "click"  # other actions are not held back
+    assert pipeline.stats()["pending"] == 2 and pipeline.stats()["coalesced"] == 4
+
+    pipeline.close()  # flushes what is still inside its window
+    calc = {e["session_id"]: e for e in sink.events if e["action"] == "calc"}
+    assert calc["s1"]["timestamp"] == "2024-05-01T10:00:00"
+    assert calc["s1"]["properties"] == {"cases": 4, "count": 5, "last_timestamp": "2024-05-01T10:00:04"}
+    assert calc["s2"]["properties"]["count"] == 1
+    assert pipeline.stats()["enqueued"] == 3 and pipeline.stats()["flushed"] == 3
+
+
+def test_window_expiry_starts_a_new_record(dash):
+    sink = dash.MemorySink()
+    pipeline = dash.EventPipeline(sink, interval=0.01, coalesce={"calc": 0.05})
+    pipeline.emit(event("calc"))
+    pipeline.emit(event("calc"))
+    wait_for(lambda: len(sink.events) == 1)
+    pipeline.emit(event("calc"))
+    wait_for(lambda: len(sink.events) == 2)
+    assert [e["properties"]["count"] for e in sink.events] == [2, 1]
+
+
+def test_calculation_event_only_when_inputs_change(monkeypatch):
+    monkeypatch.setenv("ANALYTICS_SINK", "memory")
+    at = AppTest.from_file(APP, default_timeout=120)
+
+    def calculations():
+        return sum(e["action"] == "calculation_completed" for e in at.session_state.analytics)
+
+    at.run()
+    assert calculations() == 1
+    at.radio[0].set_value("B").run()  # a rerun that changes no inputs
+    assert calculations() == 1
+    at.text_input(key="cups_A").set_value("200").run()
+    assert not at.exception and calculations() == 2
@@ -0,0 +1,88 @@
+import json
+
+import pandas as pd
+import pytest
+
+import analytics_rollup as rollup
+
+
+def event(session: str, action: str, day: int = 1, savings: float = None) -> str:
+    properties = {} if savings is None else {"potential_savings": savings}
+    return json.dumps({"timestamp": f"2024-05-{day:02d}T10:00:00", "action": action,
+                       "properties": properties, "session_id": session}) + "\n"
+
+
+def session_events(session: str, stages: int, day: int = 1) -> list:
+    return [event(session, stage, day, 1000.0 if stage == "product_interest" else None)
+            for stage in rollup.FUNNEL[:stages]]
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    events = tmp_path / "events"
+    events.mkdir()
+    return events, tmp_path / "summary"
+
+
+def write(path, lines, mode="a"):
+    with open(path, mode) as f:
+        f.write("".join(lines))
+
+
+def funnel(out) -> list:
+    return rollup.load_summaries(str(out))["funnel"]["sessions"].tolist()
+
+
+def test_second_run_only_reads_new_lines(dirs):
+    events, out = dirs
+    path = events / "events-2024-05-01.jsonl"
+    write(path, session_events("a", 4) + session_events("b", 1))
+    assert rollup.run(str(events), str(out), chunk_lines=2) == {"events": 5, "sessions": 2, "files": 1}
+
+    # "b" comes back the next day and goes further; "c" is new
+    write(path, session_events("b", 3, day=2) + session_events("c", 2, day=2))
+    assert rollup.run(str(events), str(out), chunk_lines=2) == {"events": 5, "sessions": 3, "files": 1}
+    assert rollup.run(str(events), str(out))["events"] == 0
+
+    assert funnel(out) == [3, 3, 2, 1]
+    per_day = rollup.load_summaries(str(out))["sessions_per_day"]
+    assert dict(zip(per_day["date"], per_day["sessions"])) == {"2024-05-01": 2, "2024-05-02": 1}
+    assert rollup.load_summaries(str(out))["savings_stats"]["count"].item() == 2
+
+
+def test_partial_trailing_line_waits_for_the_next_run(dirs):
+    events, out = dirs
+    path = events / "events-2024-05-01.jsonl"
+    line = event("a", "calculation_completed")
+    write(path, [event("a", "session_start"), line[:10]])
+    assert rollup.run(str(events), str(out))["events"] == 1
+    with open(out / rollup.MANIFEST) as f:
+        assert json.load(f) == {path.name: len(event("a", "session_start").encode())}
+
+    write(path, [line[10:], "not json\n"])
+    assert rollup.run(str(events), str(out))["events"] == 1
+    assert funnel(out) == [1, 1, 0, 0]
+
+
+def test_full_rebuilds_from_scratch(dirs, capsys):
+    events, out = dirs
+    write(events / "events-2024-05-01.jsonl", session_events("a", 2))
+    write(events / "events-2024-05-02.jsonl", session_events("b", 4, day=2))
+    args = ["--events", str(events), "--out", str(out)]
+    rollup.main(args)
+    rollup.main(args)
+    assert "processed 0 new events" in capsys.readouterr().out
+    rollup.main(args + ["--full"])
+    assert "processed 6 new events; 2 sessions across 2 files" in capsys.readouterr().out
+    assert funnel(out) == [2, 2, 1, 1]
+
+
+def test_update_sessions_matches_a_full_regroup():
+    lines = session_events("a", 2) + session_events("b", 4, day=3) + session_events("a", 4, day=2)
+    frames = [pd.DataFrame.from_records([json.loads(x) for x in lines[i:i + 3]]) for i in range(0, len(lines), 3)]
+    sessions = rollup.empty_sessions()
+    for frame in frames:
+        sessions = rollup.update_sessions(sessions, rollup.aggregate_sessions(frame))
+    expected = rollup.aggregate_sessions(pd.concat(frames))
+    pd.testing.assert_frame_equal(sessions.sort_index(), expected, check_dtype=False)
+    assert sessions.loc["a", "first_date"] == "2024-05-01" and sessions.loc["a"].iloc[1:].all()
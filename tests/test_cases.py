@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "performance_dashboard.py")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("ANALYTICS_SINK", "memory")
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def click(at: AppTest, label: str) -> AppTest:
+    next(b for b in at.button if b.label.startswith(label)).click().run()
+    assert not at.exception
+    return at
+
+
+def test_add_clone_delete_and_reset(app):
+    assert list(app.session_state.cases) == ["A", "B", "C"]
+    app.text_input(key="cups_A").set_value("250").run()
+
+    click(app, "➕")
+    assert list(app.session_state.cases) == ["A", "B", "C", "D"] and app.session_state.active_case == "D"
+    assert app.session_state.cases["D"]["cups"] == "180"
+
+    app.radio[0].set_value("A").run()
+    click(app, "📋")
+    assert app.session_state.active_case == "E" and app.session_state.cases["E"]["cups"] == "250"
+
+    click(app, "🗑️")
+    assert list(app.session_state.cases) == ["A", "B", "C", "D"]
+
+    click(app, "🔄")
+    assert list(app.session_state.cases) == ["A", "B", "C"]
+    assert app.text_input(key="cups_A").value == "180"
+
+
+def test_ids_continue_past_z_and_many_cases_edit_one_at_a_time(app):
+    for _ in range(24):
+        click(app, "➕")
+    assert list(app.session_state.cases)[-2:] == ["Z", "AA"]
+    # Above MAX_TABS the picker is a selectbox and only the active case has an input form
+    assert not app.radio and app.selectbox[0].value == "AA"
+    assert [t.key for t in app.text_input if (t.key or "").startswith("cups_")] == ["cups_AA"]
+
+
+def test_case_actions_keep_analysis_toggles(app):
+    app.toggle(key="heatmap_on").set_value(True).run()
+    click(app, "➕")
+    assert app.toggle(key="heatmap_on").value
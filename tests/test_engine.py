@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import threading
+
+from roi_engine import parse_count, parse_money
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_loads_no_ui_or_dataframe_libraries(tmp_path):
+    # A fresh interpreter, in an empty directory so nothing can be written next to the code
+    code = ("import sys, threading, roi_engine\n"
+            "print(sorted(m for m in ('streamlit', 'pandas', 'plotly') if m in sys.modules))\n"
+            "print(threading.active_count())")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60, cwd=tmp_path,
+                         env=dict(os.environ, PYTHONPATH=ROOT))
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split("\n")[:2] == ["[]", "1"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_parse_count_is_per_thread():
+    start = parse_count()
+    parse_money("100")
+    parse_money("100")  # cached parses still count
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append((parse_money("5"), parse_count())))
+    worker.start()
+    worker.join()
+    assert parse_count() == start + 2 and seen == [(5.0, 1)]
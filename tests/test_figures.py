@@ -0,0 +1,44 @@
+def counting(builder):
+    calls = []
+
+    def build(*args):
+        calls.append(args)
+        return builder(*args)
+
+    build.__name__ = builder.__name__
+    return build, calls
+
+
+def test_hit_returns_the_same_figure_without_rebuilding(dash):
+    cache = dash.FigureCache()
+    build, calls = counting(dash.gauge_figure)
+    fig = cache.get(build, 180.0, 120.0)
+    assert cache.get(build, 180.0, 120.0) is fig and len(calls) == 1
+    assert cache.get(build, 181.0, 120.0) is not fig and len(calls) == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2, "maxsize": 256}
+
+
+def test_builders_with_the_same_arguments_do_not_collide(dash):
+    def target_100(cups):
+        return dash.gauge_figure(cups, 100.0)
+
+    def target_200(cups):
+        return dash.gauge_figure(cups, 200.0)
+
+    cache = dash.FigureCache()
+    assert cache.get(target_100, 150.0) is not cache.get(target_200, 150.0)
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_is_bounded_and_evicts_least_recently_used(dash):
+    cache = dash.FigureCache(maxsize=3)
+    build, calls = counting(dash.gauge_figure)
+    for cups in (100.0, 200.0, 300.0):
+        cache.get(build, cups, 120.0)
+    cache.get(build, 100.0, 120.0)  # 200 is now the least recently used
+    cache.get(build, 400.0, 120.0)
+    assert cache.stats()["size"] == 3 and len(calls) == 4
+    cache.get(build, 100.0, 120.0)
+    assert len(calls) == 4
+    cache.get(build, 200.0, 120.0)
+    assert len(calls) == 5 and cache.stats()["size"] == 3
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from roi_engine import JobQueue
+
+
+def wait(job, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job {job.id} still {job.status}"
+        time.sleep(0.01)
+
+
+def gated(job, gate: threading.Event, steps: int = 3):
+    # Reports progress, then waits on `gate` checking for cancellation like a real job
+    for i in range(steps):
+        job.report(i + 1, steps)
+    while not gate.wait(0.01):
+        job.check()
+    return steps
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(max_running=2, max_per_owner=2)
+    yield q
+    q.shutdown()
+
+
+def test_job_runs_to_completion(queue):
+    gate = threading.Event()
+    job = queue.submit("a", gated, gate, owner="s1")
+    gate.set()
+    wait(job)
+    assert (job.status, job.result, job.progress) == ("done", 3, 1.0)
+    # Same inputs again - from this or another owner - re-attach to the finished job
+    assert queue.submit("a", gated, gate, owner="s2") is job
+    assert queue.stats()["submitted"] == 1 and queue.stats()["reused"] == 1
+
+
+def test_failed_job_keeps_its_error(queue):
+    def boom(job):
+        raise ValueError("boom")
+
+    job = queue.submit("f", boom)
+    wait(job)
+    assert job.status == "failed" and str(job.error) == "boom"
+    assert queue.stats()["failed"] == 1
+
+
+def test_cancel_stops_a_running_job(queue):
+    gate = threading.Event()
+    job = queue.submit("c", gated, gate, owner="s1")
+    while job.status != "running":
+        time.sleep(0.01)
+    queue.cancel("c")
+    wait(job)
+    assert job.status == "cancelled" and job.result is None
+
+
+def test_cancelled_job_is_not_reused(queue):
+    gate = threading.Event()
+    job = queue.submit("c", gated, gate, owner="s1")
+    while job.status != "running":
+        time.sleep(0.01)
+    queue.release("c", "s1")  # last owner gone: cancel requested, job still running
+    fresh = queue.submit("c", gated, gate, owner="s1")
+    assert fresh is not job
+    wait(job)  # before opening the gate, or the old job could finish "done" before it checks in
+    gate.set()
+    wait(fresh)
+    assert (job.status, fresh.status, fresh.result) == ("cancelled", "done", 3)
+    assert queue.get("c") is fresh
+
+
+def test_owner_over_its_limit_loses_its_oldest_job(queue):
+    gate = threading.Event()
+    first = queue.submit("1", gated, gate, owner="s1")
+    shared = queue.submit("2", gated, gate, owner="s1")
+    queue.submit("2", gated, gate, owner="s2")
+    queue.submit("3", gated, gate, owner="s1")  # "1" is released, and nobody else owns it
+    queue.submit("4", gated, gate, owner="s1")  # "2" is released, but s2 still waits for it
+    wait(first)
+    assert first.status == "cancelled"
+    assert not shared.finished and shared.owners == {"s2"}
+    gate.set()
+    wait(shared)
+    assert shared.status == "done"
@@ -0,0 +1,100 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from roi_engine import DEFAULTS, FIELDS, ResultCache, calc_batch, calc_case, case_key, parse_case, parse_record
+
+EDGE_VALUES = ["", "0", "-0", "1", "0.5", "100", "-250", "abc", "(1,500)", "150%", "nan%", "inf%",
+               "-inf%", "9" * 400, "1e-300", "0.000001", "31.9"]
+
+
+def random_case(rng: random.Random) -> dict:
+    vals = DEFAULTS.copy()
+    for f in FIELDS:
+        roll = rng.random()
+        if roll < 0.3:
+            vals[f] = rng.choice(EDGE_VALUES)
+        elif roll < 0.7:
+            vals[f] = f"{rng.uniform(-1e6, 1e6):.{rng.randint(0, 6)}f}"
+    return vals
+
+
+def same(a, b) -> bool:
+    return type(a) is type(b) and (a == b or (math.isnan(a) and math.isnan(b)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_calc_case_matches_array_batch(seed):
+    # calc_case takes calc_batch's scalar path; a one-element array takes the numpy path
+    rng = random.Random(seed)
+    for _ in range(200):
+        vals = random_case(rng)
+        batch = calc_batch({f: np.array([v]) for f, v in parse_case(vals).items()})
+        expected = {k: v.item() for k, v in batch.items()}
+        if not math.isfinite(expected["days"]):  # days can't be an int: calc_case raises like int() does
+            for case in (vals, parse_record(vals)):
+                with pytest.raises((OverflowError, ValueError)):
+                    calc_case(case)
+            continue
+        expected["days"] = int(expected["days"])
+        for got in (calc_case(vals), calc_case(parse_record(vals))):
+            assert list(got) == list(expected)
+            bad = {k: (got[k], expected[k]) for k in got if not same(got[k], expected[k])}
+            assert not bad, (vals, bad)
+
+
+def test_calc_case_defaults():
+    R = calc_case(DEFAULTS)
+    assert R["days"] == 26 and isinstance(R["days"], int)
+    assert R["revenue"] == 75 * 180 * 26
+    assert R["net"] == pytest.approx(R["revenue"] - 30 * 180 * 26 - 130000)
+    assert R["payback"] == pytest.approx(280000 / R["net"])
+    assert np.isnan(calc_case(dict(DEFAULTS, price="1"))["bep_day"])
+
+
+def test_blank_cogs_thb_uses_cogs_pct():
+    assert calc_case(dict(DEFAULTS, cogs_thb="", cogs_pct="40"))["var_cup"] == 75 * 0.4 + 2
+    # A typed value never reads as blank, even one float() turns into NaN
+    assert calc_case(dict(DEFAULTS, cogs_thb="nan%", cogs_pct="40"))["var_cup"] == 2
+
+
+def test_result_cache_hits_return_the_cached_result():
+    cache = ResultCache()
+    cases = {"A": DEFAULTS, "B": dict(DEFAULTS, cups="90")}
+    first = cache.get_many(cases)
+    assert first == {cid: calc_case(vals) for cid, vals in cases.items()}
+    again = cache.get_many(cases)
+    assert all(again[cid] is first[cid] for cid in cases)
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 2, "maxsize": 1024}
+
+
+def test_result_cache_misses_when_an_input_changes():
+    cache = ResultCache()
+    before = cache.get(DEFAULTS)
+    after = cache.get(dict(DEFAULTS, rent="40000"))
+    assert after["net"] == before["net"] - 5000 and cache.stats()["misses"] == 2
+    # Only FIELDS are part of the key, and a blank is not the same input as "0"
+    assert case_key(dict(DEFAULTS, name="ร้าน A")) == case_key(DEFAULTS)
+    assert case_key(dict(DEFAULTS, cogs_thb="")) != case_key(dict(DEFAULTS, cogs_thb="0"))
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    a, b, c = (dict(DEFAULTS, cups=str(n)) for n in (100, 200, 300))
+    cache.get(a), cache.get(b), cache.get(a), cache.get(c)  # b is the least recently used
+    assert cache.stats()["size"] == 2
+    cache.get(a)
+    assert cache.stats()["hits"] == 2
+    cache.get(b)
+    assert cache.stats()["misses"] == 4
+
+
+def test_result_cache_uses_given_keys_and_records():
+    cache = ResultCache()
+    cases = {"A": DEFAULTS, "B": dict(DEFAULTS, price="90")}
+    keys = {cid: case_key(vals) for cid, vals in cases.items()}
+    records = {cid: parse_record(vals) for cid, vals in cases.items()}
+    assert cache.get_many(cases, keys, records) == {cid: calc_case(vals) for cid, vals in cases.items()}
+    assert cache.get_many(cases)["B"] is cache.get_many(cases, keys)["B"]
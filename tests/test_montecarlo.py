@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from roi_engine import (DEFAULTS, MC_CHUNK, MC_FIELDS, MC_MAX_SAMPLES, dist_spec, draw_samples, mc_block, mc_blocks,
+                        mc_summary, monte_carlo, parse_record)
+
+P = parse_record(DEFAULTS)
+N = 2 * MC_CHUNK + 500  # two full blocks and a short one
+
+
+def dists(kind: str = "normal", fields=MC_FIELDS) -> dict:
+    return {f: dist_spec(kind, float(P[f]), 0.2) for f in fields}
+
+
+def assert_same_summary(a: dict, b: dict):
+    assert a.keys() == b.keys()
+    for key in a:
+        np.testing.assert_array_equal(a[key], b[key], err_msg=key)
+
+
+def test_blocks_cover_n_and_respect_the_cap():
+    assert mc_blocks(N) == [(0, MC_CHUNK), (MC_CHUNK, MC_CHUNK), (2 * MC_CHUNK, 500)]
+    assert mc_blocks(0) == [(0, 1)]
+    assert sum(size for _, size in mc_blocks(10 * MC_MAX_SAMPLES)) == MC_MAX_SAMPLES
+
+
+@pytest.mark.parametrize("kind", ["normal", "triangular", "uniform"])
+def test_same_seed_same_result(kind):
+    assert_same_summary(monte_carlo(P, dists(kind), N, 7), monte_carlo(P, dists(kind), N, 7))
+    assert monte_carlo(P, dists(kind), N, 7)["net_p50"] != monte_carlo(P, dists(kind), N, 8)["net_p50"]
+
+
+def test_blocks_are_independent_of_evaluation_order():
+    blocks = mc_blocks(N)
+    results = {start: mc_block(P, dists(), 3, start, size) for start, size in reversed(blocks)}
+    net = np.concatenate([results[start][0] for start, _ in blocks])
+    payback = np.concatenate([results[start][1] for start, _ in blocks])
+    assert_same_summary(mc_summary(net, payback), monte_carlo(P, dists(), N, 3))
+
+
+def test_adding_a_distribution_keeps_other_fields_samples():
+    # "price" comes before "cups" in FIELDS; a zero-width range is a constant that draws nothing
+    cups_only = {"cups": dist_spec("normal", float(P["cups"]), 0.2)}
+    with_price = dict(cups_only, price=("uniform", float(P["price"]), float(P["price"])))
+    for start, size in mc_blocks(N):
+        np.testing.assert_array_equal(mc_block(P, with_price, 5, start, size)[0],
+                                      mc_block(P, cups_only, 5, start, size)[0])
+
+
+def test_no_distributions_is_the_base_case():
+    mc = monte_carlo(P, {}, 1000, 1)
+    net = mc_block(P, {}, 1, 0, 1)[0][0]
+    assert mc["net_p5"] == mc["net_p50"] == mc["net_p95"] == net
+    assert mc["p_loss"] == float(net < 0)
+
+
+def test_draw_samples_stay_non_negative():
+    rng = np.random.default_rng(0)
+    assert draw_samples(rng, ("normal", 1.0, 5.0), 10_000).min() >= 0
+    np.testing.assert_array_equal(draw_samples(rng, ("triangular", 3.0, 3.0, 3.0), 4), [3.0] * 4)
+    with pytest.raises(ValueError):
+        draw_samples(rng, ("lognormal", 1.0, 1.0), 4)
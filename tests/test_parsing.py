@@ -0,0 +1,41 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from roi_engine import parse_money, parse_money_series, pct_to_float
+
+MESSY = ["฿1,234", "30%", "", "abc", "1e3", "(500)", "  42 ", "฿ 35,000", "-12.5", "(15%)", "nan%", "7.5.1",
+         "2_0%", "฿", "0", "1e3", "30%", None]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("฿1,234", 1234.0), ("30%", 0.3), ("", 0.0), ("abc", 0.0), ("1e3", 13.0), ("(500)", -500.0),
+    ("(15%)", -0.15), ("nan%", 0.0), (None, 0.0),
+])
+def test_parse_money(text, expected):
+    assert parse_money(text) == expected
+
+
+def test_parse_money_default_and_pct():
+    assert parse_money("", 26) == 26 and parse_money("abc", 4) == 4
+    assert pct_to_float("30") == 0.3 and pct_to_float("0.3") == 0.3 and pct_to_float("30%") == 0.3
+
+
+@pytest.mark.parametrize("default", [0.0, 26.0])
+def test_series_matches_parse_money(default):
+    values = pd.Series(MESSY, index=range(100, 100 + len(MESSY)), name="rent")
+    parsed = parse_money_series(values, default)
+    assert list(parsed.index) == list(values.index) and parsed.name == "rent"
+    assert parsed.tolist() == [parse_money(v, default) for v in MESSY]
+
+
+def test_series_blank_value():
+    parsed = parse_money_series(pd.Series(["28", "", None, "  "]), blank=np.nan)
+    assert parsed[0] == 28 and all(math.isnan(v) for v in parsed[1:])
+
+
+def test_series_numeric_column():
+    parsed = parse_money_series(pd.Series([1, 2.5, None]), default=4.0)
+    assert parsed.tolist() == [1.0, 2.5, 4.0]
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+from roi_engine import (DEFAULTS, MC_CHUNK, MC_FIELDS, WorkerPool, dist_spec, mc_block, mc_blocks, mc_summary,
+                        monte_carlo, parse_record)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(workers=2)
+    yield pool
+    pool.shutdown()
+
+
+def pooled_monte_carlo(pool, vals, dists, n, seed):
+    # What the dashboard's background job does: blocks on the pool, summarised here
+    blocks = pool.map(mc_block, [(vals, dists, seed, start, size) for start, size in mc_blocks(n)]).result()
+    return mc_summary(np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks]))
+
+
+def assert_same_summary(a: dict, b: dict):
+    assert a.keys() == b.keys()
+    for key in a:
+        np.testing.assert_array_equal(a[key], b[key], err_msg=key)
+
+
+@pytest.mark.parametrize("kind", ["normal", "triangular", "uniform"])
+def test_pool_matches_in_process(pool, kind):
+    P = parse_record(DEFAULTS)
+    dists = {f: dist_spec(kind, float(P[f]), 0.2) for f in MC_FIELDS}
+    n = 3 * MC_CHUNK + 123  # several blocks plus a short last one
+    assert_same_summary(pooled_monte_carlo(pool, P, dists, n, 7), monte_carlo(P, dists, n, 7))
+    assert pool.stats()["started"]
+
+
+def test_cancelled_pool_job_drops_queued_tasks(pool):
+    P = parse_record(DEFAULTS)
+    dists = {"cups": dist_spec("normal", float(P["cups"]), 0.2)}
+    job = pool.map(mc_block, [(P, dists, 1, start, size) for start, size in mc_blocks(1_000_000)])
+    job.cancel()
+    assert job.cancelled and not job.finished
+    with pytest.raises(RuntimeError):
+        job.wait()
+
+
+def test_workers_do_not_rerun_the_main_script(tmp_path):
+    # Like `streamlit run`, the script has top-level side effects and no __main__ guard
+    marker = tmp_path / "runs.txt"
+    script = tmp_path / "app.py"
+    script.write_text(textwrap.dedent(f"""
+        from roi_engine import DEFAULTS, WorkerPool, mc_block, parse_record
+        with open({str(marker)!r}, "a") as f:
+            f.write("run\\n")
+        pool = WorkerPool(workers=2)
+        net, _ = pool.map(mc_block, [(parse_record(DEFAULTS), {{}}, 0, 0, 10)] * 4).result()[0]
+        pool.shutdown()
+        print(len(net))
+    """))
+    out = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120,
+                         env=dict(os.environ, PYTHONPATH=ROOT))
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split() == ["10"]
+    assert marker.read_text().splitlines() == ["run"]
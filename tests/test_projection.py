@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+from roi_engine import DEFAULTS, calc_case, case_columns, parse_record, project_cashflows
+from roi_engine.projection import _irr_monthly
+
+P = parse_record(DEFAULTS)
+
+
+def test_flat_projection_repeats_the_monthly_pnl():
+    base = calc_case(DEFAULTS)
+    proj = project_cashflows(P, months=24)
+    assert proj["cash"].shape == (25,) and proj["cash"][0] == -P["capex"]
+    np.testing.assert_allclose(proj["revenue"], base["revenue"])
+    np.testing.assert_allclose(proj["op"], base["op"])
+    np.testing.assert_allclose(proj["cash"][1:], base["op"])  # no tax in DEFAULTS; depreciation is non-cash
+    # Depreciation runs for dep_years (4) and is deducted before tax, so net is op - depr throughout
+    np.testing.assert_allclose(proj["net"], base["op"] - base["depr"])
+    np.testing.assert_allclose(proj["cumulative"], np.cumsum(proj["cash"]))
+    assert proj["payback_month"] == math.ceil(P["capex"] / base["op"])
+
+
+def test_depreciation_stops_after_dep_years_and_lowers_tax_while_it_lasts():
+    vals = dict(DEFAULTS, dep_years="1", tax_pct="20")
+    base = calc_case(vals)
+    proj = project_cashflows(parse_record(vals), months=24)
+    np.testing.assert_allclose(proj["tax"][:12], (base["op"] - base["depr"]) * 0.2)
+    np.testing.assert_allclose(proj["tax"][12:], base["op"] * 0.2)
+    np.testing.assert_allclose(proj["net"][12:], base["net"])
+
+
+def test_ramp_seasonality_and_rent_growth():
+    base = calc_case(DEFAULTS)
+    season = [1.0] * 11 + [1.5]
+    proj = project_cashflows(P, months=24, ramp_months=4, ramp_start=0.5, seasonality=season, rent_growth=0.1)
+    np.testing.assert_allclose(proj["revenue"][:5], base["revenue"] * np.array([0.5, 0.625, 0.75, 0.875, 1.0]))
+    assert proj["revenue"][11] == pytest.approx(base["revenue"] * 1.5)
+    # Rent steps up once a year
+    assert proj["op"][12] - proj["op"][10] == pytest.approx(-P["rent"] * 0.1)
+
+
+def test_cases_axis_matches_one_case_at_a_time():
+    cases = [DEFAULTS, dict(DEFAULTS, cups="60"), dict(DEFAULTS, price="95", capex="0")]
+    batch = project_cashflows(case_columns([parse_record(v) for v in cases]), months=36)
+    for i, vals in enumerate(cases):
+        one = project_cashflows(parse_record(vals), months=36)
+        for key, value in one.items():
+            np.testing.assert_allclose(batch[key][i], value, err_msg=key)
+
+
+def test_npv_and_losing_cases():
+    proj = project_cashflows(P, months=36, discount_rate=0.0)
+    assert proj["npv"] == pytest.approx(proj["cumulative"][-1])
+    assert project_cashflows(P, months=36, discount_rate=0.2)["npv"] < proj["npv"]
+
+    losing = project_cashflows(parse_record(dict(DEFAULTS, cups="60")), months=36)
+    assert (losing["cash"] < 0).all()
+    assert math.isnan(losing["payback_month"]) and math.isnan(losing["irr_annual"])
+
+
+@pytest.mark.parametrize("cash, rate", [
+    ([-100, 110], 0.10),
+    ([-100, 0, 121], 0.10),
+    ([-1000] + [100] * 12, None),
+])
+def test_irr_solves_npv_zero(cash, rate):
+    irr = _irr_monthly(np.array(cash, dtype=float))
+    if rate is not None:
+        assert irr == pytest.approx(rate)
+    t = np.arange(len(cash))
+    assert (np.array(cash) / (1 + irr) ** t).sum() == pytest.approx(0, abs=1e-6)
+
+
+@pytest.mark.parametrize("cash", [[100, 50, 10], [-100, -50, -10], [0, 0, 0]])
+def test_irr_is_nan_without_a_sign_change(cash):
+    assert math.isnan(_irr_monthly(np.array(cash, dtype=float)))
+
+
+def test_irr_is_vectorized_over_rows():
+    cash = np.array([[-100, 110], [-100, -10], [-100, 121]], dtype=float)
+    np.testing.assert_allclose(_irr_monthly(cash), [0.10, np.nan, 0.21])
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import roi_batch
+from roi_engine import DEFAULTS, benchmark_tiers, calc_case
+
+ROWS = [
+    {"name": "สยาม", "price": "฿85", "cups": "220", "rent": "฿60,000", "cogs_thb": ""},
+    {"name": "อารีย์", "price": "75", "cups": "150", "rent": "35000", "cogs_thb": "28"},
+    {"name": "บางนา", "price": "(10)", "cups": "abc", "rent": "", "cogs_thb": "nan%"},
+    {"name": "ทองหล่อ", "price": "95", "cups": "1e3", "rent": "90,000", "cogs_thb": "30"},
+    {"name": "ลาดพร้าว", "price": "65", "cups": "180", "rent": "28000", "cogs_thb": "25"},
+]
+
+
+def expected_rows(rows: list) -> pd.DataFrame:
+    # What the dashboard shows for each row: missing columns take DEFAULTS
+    results = [calc_case(dict(DEFAULTS, **{k: v for k, v in row.items() if k != "name"})) for row in rows]
+    out = pd.DataFrame({"name": [row["name"] for row in rows]})
+    for name in roi_batch.RESULT_COLUMNS:
+        out[name] = [r[name] for r in results]
+    for name, (metric, source) in roi_batch.TIER_COLUMNS.items():
+        out[name] = benchmark_tiers(metric, [r[source] for r in results])
+    return out
+
+
+def read(path) -> pd.DataFrame:
+    return pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("src, dst", [("csv", "parquet"), ("parquet", "csv"), ("csv", "csv")])
+def test_run_matches_the_dashboard_and_keeps_row_order(tmp_path, src, dst, workers):
+    df = pd.DataFrame(ROWS)
+    inp, out = tmp_path / f"cases.{src}", tmp_path / f"results.{dst}"
+    if src == "parquet":
+        df.to_parquet(inp)
+    else:
+        df.to_csv(inp, index=False)
+
+    summary = roi_batch.run(str(inp), str(out), chunk_rows=2, workers=workers)
+    assert summary["rows"] == len(ROWS) and summary["chunks"] == 3
+    pd.testing.assert_frame_equal(read(out), expected_rows(ROWS), check_dtype=False)
+    assert not (tmp_path / f"results.{dst}.tmp").exists()
+
+
+def test_numeric_parquet_columns(tmp_path):
+    inp, out = tmp_path / "cases.parquet", tmp_path / "results.parquet"
+    pd.DataFrame({"name": ["a", "b"], "price": [75.0, np.nan], "cups": [180, 90]}).to_parquet(inp)
+    roi_batch.run(str(inp), str(out))
+    assert read(out)["revenue"].tolist() == [75 * 180 * 26, 0.0]
+
+
+def test_failed_run_leaves_no_partial_output(tmp_path, monkeypatch):
+    inp, out = tmp_path / "cases.csv", tmp_path / "results.csv"
+    pd.DataFrame(ROWS).to_csv(inp, index=False)
+    out.write_text("previous results\n")
+    evaluate = roi_batch.evaluate_chunk
+    calls = []
+
+    def fail_on_second_chunk(df):
+        calls.append(len(df))
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return evaluate(df)
+
+    monkeypatch.setattr(roi_batch, "evaluate_chunk", fail_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        roi_batch.run(str(inp), str(out), chunk_rows=2)
+    assert out.read_text() == "previous results\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cases.csv", "results.csv"]
+
+
+def test_input_without_model_columns_is_rejected(tmp_path):
+    inp, out = tmp_path / "cases.csv", tmp_path / "results.parquet"
+    pd.DataFrame({"name": ["a"], "city": ["BKK"]}).to_csv(inp, index=False)
+    with pytest.raises(ValueError, match="No model columns"):
+        roi_batch.run(str(inp), str(out))
+    assert not out.exists() and not (tmp_path / "results.parquet.tmp").exists()
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        roi_batch.run(str(inp), str(tmp_path / "results.xlsx"))
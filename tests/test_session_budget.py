@@ -0,0 +1,48 @@
+import logging
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "performance_dashboard.py")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    def start(budget_kb: int) -> AppTest:
+        # The session registry is a cache_resource, created with the budget of the first run
+        monkeypatch.setenv("SESSION_BUDGET_KB", str(budget_kb))
+        monkeypatch.setenv("ANALYTICS_SINK", "memory")
+        st.cache_resource.clear()
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()
+        assert not at.exception
+        return at
+
+    yield start
+    st.cache_resource.clear()
+
+
+def budget_warnings(caplog) -> list:
+    return [r for r in caplog.records if r.name == "performance_dashboard" and "budget" in r.getMessage()]
+
+
+def test_session_within_budget_keeps_everything(app, caplog):
+    at = app(10_000)
+    assert "analytics" in at.session_state and "parsed" in at.session_state
+    assert not budget_warnings(caplog)
+
+
+def test_tiny_budget_evicts_the_event_buffer_only(app, caplog):
+    caplog.set_level(logging.WARNING, logger="performance_dashboard")
+    at = app(1)
+    assert "analytics" not in at.session_state
+    # Parsed records are rebuilt on every run, so evicting them would save nothing
+    assert "parsed" in at.session_state
+    assert len(budget_warnings(caplog)) == 1
+
+    at.text_input(key="rent_A").set_value("40000").run()
+    assert not at.exception
+    assert "parsed" in at.session_state
+    assert len(budget_warnings(caplog)) == 1  # logged when the session goes over, not on every run
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from roi_engine import DEFAULTS, FIELDS, MAX_TOKEN_CHARS, MAX_VALUE_CHARS, decode_cases, encode_cases
+
+
+def random_case(rng):
+    return {f: str(rng.randint(0, 10 ** rng.randint(1, 9))) for f in FIELDS}
+
+
+def case_ids(n):
+    return [f"C{i}" for i in range(n)]
+
+
+def test_round_trip():
+    rng = random.Random(0)
+    cases = {cid: random_case(rng) for cid in case_ids(20)}
+    cases["C3"] = DEFAULTS.copy()
+    token = encode_cases(cases, "C7")
+    assert len(token) < 2000
+    assert decode_cases(token) == (cases, "C7")
+
+
+def test_value_length_limit():
+    at_limit = {"A": dict(DEFAULTS, rent="1" * MAX_VALUE_CHARS)}
+    assert decode_cases(encode_cases(at_limit, "A"))[0] == at_limit
+    with pytest.raises(ValueError):
+        encode_cases({"A": dict(DEFAULTS, rent="1" * (MAX_VALUE_CHARS + 1))}, "A")
+
+
+def test_token_length_limit():
+    # Add random cases until encoding refuses; the last token it did emit must still decode
+    rng = random.Random(1)
+    cases, last = {}, None
+    for cid in case_ids(1000):
+        cases[cid] = random_case(rng)
+        try:
+            last = (encode_cases(cases, cid), dict(cases), cid)
+        except ValueError:
+            break
+    else:
+        pytest.fail("token never reached MAX_TOKEN_CHARS")
+    token, expected, active = last
+    assert MAX_TOKEN_CHARS - 200 < len(token) <= MAX_TOKEN_CHARS
+    assert decode_cases(token) == (expected, active)
+
+
+def test_payload_size_limit():
+    # Identical long values compress very well, so the decompressed size is the binding limit
+    cases = {cid: {f: "9" * MAX_VALUE_CHARS for f in FIELDS} for cid in case_ids(200)}
+    with pytest.raises(ValueError):
+        encode_cases(cases, "C0")
+    cases = dict(list(cases.items())[:50])
+    assert decode_cases(encode_cases(cases, "C0"))[0] == cases
+
+
+def test_rejects_unshareable_case_ids():
+    with pytest.raises(ValueError):
+        encode_cases({"Case 1": DEFAULTS.copy()}, "Case 1")
+
+
+@pytest.mark.parametrize("token", ["", "2abc", "1garbage", "1" + "A" * (MAX_TOKEN_CHARS + 1)])
+def test_decode_rejects_bad_tokens(token):
+    with pytest.raises(ValueError):
+        decode_cases(token)